@@ -5,21 +5,50 @@ Entry point script for the Agent-as-Coder system that automatically generates
 and tests a Python parser for bank statement PDFs.
 
 Usage:
-    python agent.py --target <bank_name>
+    python agent.py --target <bank_name> [<bank_name> ...]
+    python agent.py --all [--concurrency N]
+    python agent.py --target <bank_name> --resume
+    python agent.py --runs <bank_name>
 
 Arguments:
-    --target: The bank name to process (e.g., "icici", "sbi"). This determines
-              the input PDF and CSV files under the `data/<bank>/` directory.
+    --target: One or more bank names to process (e.g., "icici", "sbi"). This
+              determines the input PDF and CSV files under `data/<bank>/`.
+    --all: Process every bank directory under `data/`.
+    --concurrency: Maximum number of banks run at the same time (default 4).
+    --provider: LLM provider: gemini (default), cerebras, groq, openai,
+              together or fake; its SDK is imported only when selected.
+    --model: Model name for the provider (default: the provider's default).
+    --llm-cache: LLM response cache mode: "on" (default), "off" or "replay".
+              Replay serves every LLM call from .cache/llm and needs no API key.
+    --pdf-backend: PDF text backend for this run: "pdfplumber" (default),
+              "pymupdf" or "pypdfium2" (see utils/backends.py).
+    --candidates: Number of parser candidates generated concurrently per
+              iteration and tested in parallel (default 1).
+    --resume: Continue the latest interrupted run of each bank on the same
+              input files from its last checkpoint instead of starting again.
+    --runs: List past runs of a bank from the checkpoint database and exit.
+    --prom-textfile: Also write run metrics to this Prometheus textfile
+              (default $PROMETHEUS_TEXTFILE; unset disables).
 
 Functionality:
 - Validates presence of the required PDF and CSV files.
+- Picks up extra sample pairs (data/<bank>/<name>.pdf + <name>.csv); every
+  candidate parser is tested against all of them in parallel.
 - Loads CSV schema and sample data for test verification.
 - Extracts sample text from the PDF for prompt generation.
 - Initializes the agent state with all necessary info.
 - Builds and runs the LangGraph-based agent to generate, test, and refine
-  the custom parser code.
+  the custom parser code. A preflight step first tests the existing parsers
+  with the most similar table layouts and adopts one that already passes.
 - Prints final status and saves the generated parser under
   `custom_parsers/<bank>_parser.py`.
+- In batch mode (several targets or --all), runs one graph per bank on a
+  bounded thread pool, so imports and clients are set up once, and prints a
+  summary table of iterations, wall time and pass/fail per bank.
+- Checkpoints every node's output to SQLite (src/checkpoint.py), so a
+  crashed or killed run can be resumed with --resume.
+- Records a trace per bank run (node, helper and LLM timings, tokens,
+  retries; see utils/trace.py) and writes it as JSON under .cache/traces/.
 
 This script requires the following modules in the project structure:
 - utils.helpers: For CSV analysis and PDF sample extraction.
@@ -28,29 +57,54 @@ This script requires the following modules in the project structure:
 
 Example:
     python agent.py --target icici
+    python agent.py --all --concurrency 8
 
 """
 
-import argparse, os, sys
+import argparse, os, sys, glob, time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from utils.helpers import analyze_csv, extract_pdf_sample
+from utils.layout import ensure_layout
+from utils.backends import BACKENDS
+from utils import trace
 from src.state import AgentState
 from src.graph import build_graph
+from src.checkpoint import SqliteSaver, input_key, new_thread_id
+from src import llm
 
-def main():
-    p = argparse.ArgumentParser(description="Agent-as-Coder for PDF bank statement parsing.")
-    p.add_argument("--target", required=True, help="Bank name (e.g., icici, sbi)")
-    args = p.parse_args()
+def find_samples(bank: str) -> list[list[str]]:
+    """
+    Returns the (pdf, csv) sample pairs of a bank, primary pair first.
+
+    The primary pair is data/<bank>/<bank>_sample.pdf with result.csv; every
+    other data/<bank>/<name>.pdf with a matching <name>.csv is an extra sample.
+    """
+    primary = [f"data/{bank}/{bank}_sample.pdf", f"data/{bank}/result.csv"]
+    extra = [[pdf, pdf[:-4] + ".csv"] for pdf in sorted(glob.glob(f"data/{bank}/*.pdf"))
+             if pdf != primary[0] and os.path.exists(pdf[:-4] + ".csv")]
+    return [primary] + extra
+
+def build_state(bank: str, candidates: int = 1) -> AgentState:
+    """
+    Builds the initial agent state for a bank from its data/<bank>/ files.
+
+    The bank's table layout is learned from the sample PDF on first use and
+    stored as custom_parsers/<bank>_layout.json (see utils.layout). The
+    prompt is built from the primary sample; parsers are tested against
+    every sample pair (see `find_samples`).
 
-    bank = args.target.lower()
-    pdf = f"data/{bank}/{bank}_sample.pdf"
-    csvp = f"data/{bank}/result.csv"
+    Raises:
+        FileNotFoundError: If the sample PDF or result.csv is missing
+    """
+    samples = find_samples(bank)
+    pdf, csvp = samples[0]
 
     if not os.path.exists(pdf) or not os.path.exists(csvp):
-        print(f"Error: Missing {pdf} or {csvp}")
-        sys.exit(1)
+        raise FileNotFoundError(f"Missing {pdf} or {csvp}")
 
     info = analyze_csv(csvp)
-    state: AgentState = {
+    return {
         "bank": bank,
         "pdf_path": pdf,
         "csv_path": csvp,
@@ -63,14 +117,153 @@ def main():
         "csv_shape": info["shape"],
         "csv_sample": info["sample"],
         "pdf_sample": extract_pdf_sample(pdf),
+        "layout": ensure_layout(bank, pdf, info["columns"]),
+        "samples": samples,
+        "candidates": candidates,
     }
 
-    agent = build_graph()
-    print(f"Starting agent for bank: {bank}...\n")
-    result = agent.invoke(state)
+def invoke_bank(agent, saver: SqliteSaver, state: AgentState, resume: bool = False) -> dict:
+    """
+    Runs the graph for one bank under a checkpointed thread.
+
+    With `resume`, the latest run on the same bank and input files continues
+    from its last checkpoint (straight into its next node, with its code and
+    feedback) if it did not finish; otherwise a new run is started.
+    """
+    bank = state["bank"]
+    if resume:
+        for thread_id in saver.threads(input_key(bank, state["pdf_path"], state["csv_path"]))[:1]:
+            config = {"configurable": {"thread_id": thread_id}}
+            snapshot = agent.get_state(config)
+            if snapshot.next:
+                print(f"[{bank}] Resuming {thread_id} at iteration {snapshot.values['iterations']} "
+                      f"(next: {', '.join(snapshot.next)})")
+                return agent.invoke(None, config)
+            print(f"[{bank}] Latest run {thread_id} already finished; starting a new run")
+    config = {"configurable": {"thread_id": new_thread_id(bank, state["pdf_path"], state["csv_path"])}}
+    return agent.invoke(state, config)
+
+def run_bank(bank: str, agent, saver: SqliteSaver, candidates: int = 1, resume: bool = False) -> dict:
+    """
+    Runs the compiled graph for one bank and returns its summary row.
+
+    Errors are caught and reported in the row so one broken bank does not
+    stop the rest of a batch.
+    """
+    start = time.perf_counter()
+    row = {"bank": bank, "iterations": 0, "success": False, "error": ""}
+    with trace.run("agent", bank=bank, candidates=candidates) as t:
+        try:
+            result = invoke_bank(agent, saver, build_state(bank, candidates), resume)
+            row.update(iterations=result["iterations"], success=result["success"])
+        except Exception as e:
+            row["error"] = str(e)
+        t.attrs.update(iterations=row["iterations"], success=row["success"], error=row["error"])
+    row["seconds"] = time.perf_counter() - start
+    row["trace"] = t
+    return row
+
+def save_traces(traces: list, prom_textfile: str = "") -> None:
+    """
+    Exports each run's JSON trace and, if requested, a Prometheus textfile.
+    """
+    for t in traces:
+        path = t.export()
+        if path:
+            print(f"Trace for {t.attrs.get('bank')} written to {path}")
+    if prom_textfile:
+        trace.write_prometheus(traces, prom_textfile)
+
+def print_summary(rows: list[dict]) -> None:
+    """
+    Prints the per-bank batch summary table.
+    """
+    print(f"\n{'bank':<16}{'iterations':>11}{'wall time':>12}  result")
+    for r in rows:
+        status = "PASS" if r["success"] else ("ERROR: " + r["error"] if r["error"] else "FAIL")
+        print(f"{r['bank']:<16}{r['iterations']:>11}{r['seconds']:>11.1f}s  {status}")
+    passed = sum(r["success"] for r in rows)
+    print(f"\n{passed}/{len(rows)} banks passed")
 
-    print(f"Parser saved to custom_parsers/{bank}_parser.py")
-    print(f"\n✅ FINAL: SUCCESS in {result['iterations']} iterations")
+def print_runs(saver: SqliteSaver, bank: str) -> None:
+    """
+    Prints past runs of a bank, newest first.
+    """
+    runs = saver.runs(bank)
+    if not runs:
+        print(f"No recorded runs for {bank}")
+        return
+    fmt = lambda t: datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"{'thread':<48}{'started':>21}{'updated':>21}{'iterations':>11}  result")
+    for r in runs:
+        print(f"{r['thread_id']:<48}{fmt(r['started']):>21}{fmt(r['updated']):>21}{r['iterations']:>11}  "
+              f"{'PASS' if r['success'] else 'FAIL'}")
+
+def main():
+    p = argparse.ArgumentParser(description="Agent-as-Coder for PDF bank statement parsing.")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--target", nargs="+", help="Bank name(s) (e.g., icici, sbi)")
+    group.add_argument("--all", action="store_true", help="Process every bank under data/")
+    group.add_argument("--runs", metavar="BANK", help="List past runs of a bank and exit")
+    p.add_argument("--concurrency", type=int, default=4, help="Maximum banks processed at once in batch mode")
+    p.add_argument("--provider", choices=list(llm.PROVIDERS), default=llm.PROVIDER,
+                   help="LLM provider (default: $LLM_PROVIDER or gemini)")
+    p.add_argument("--model", default=llm.MODEL, help="Model name (default: $LLM_MODEL or the provider's default)")
+    p.add_argument("--llm-cache", choices=["on", "off", "replay"], default=llm.CACHE_MODE,
+                   help="LLM response cache mode (default: $LLM_CACHE or 'on')")
+    p.add_argument("--candidates", type=int, default=1,
+                   help="Parser candidates generated and tested in parallel per iteration")
+    p.add_argument("--pdf-backend", choices=BACKENDS, default=os.getenv("PDF_BACKEND", "pdfplumber"),
+                   help="PDF text backend (default: $PDF_BACKEND or pdfplumber)")
+    p.add_argument("--resume", action="store_true",
+                   help="Resume the latest interrupted run of each bank from its last checkpoint")
+    p.add_argument("--prom-textfile", default=trace.PROMETHEUS_TEXTFILE,
+                   help="Write run metrics to this Prometheus textfile (default: $PROMETHEUS_TEXTFILE)")
+    args = p.parse_args()
+    llm.CACHE_MODE = args.llm_cache
+    llm.PROVIDER, llm.MODEL = args.provider, args.model
+    os.environ["PDF_BACKEND"] = args.pdf_backend
+    saver = SqliteSaver()
+
+    if args.runs:
+        print_runs(saver, args.runs.lower())
+        return
+
+    if args.all:
+        banks = sorted(os.path.basename(os.path.dirname(d)) for d in glob.glob("data/*/"))
+    else:
+        banks = [t.lower() for t in args.target]
+    agent = build_graph(saver)
+
+    if len(banks) == 1:
+        bank = banks[0]
+        try:
+            with trace.run("agent", bank=bank, candidates=args.candidates) as t:
+                try:
+                    state = build_state(bank, args.candidates)
+                except FileNotFoundError as e:
+                    print(f"Error: {e}")
+                    sys.exit(1)
+
+                print(f"Starting agent for bank: {bank}...\n")
+                result = invoke_bank(agent, saver, state, args.resume)
+                t.attrs.update(iterations=result["iterations"], success=result["success"])
+        finally:
+            save_traces([t], args.prom_textfile)
+
+        if result.get("adopted_from"):
+            print(f"Reused the existing {result['adopted_from']} parser; no LLM calls were made")
+        print(f"Parser saved to custom_parsers/{bank}_parser.py")
+        print(f"\n✅ FINAL: SUCCESS in {result['iterations']} iterations")
+        return
+
+    print(f"Starting agent for {len(banks)} banks (concurrency {args.concurrency})...")
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        rows = list(pool.map(lambda b: run_bank(b, agent, saver, args.candidates, args.resume), banks))
+    print_summary(rows)
+    save_traces([r["trace"] for r in rows], args.prom_textfile)
+    if not all(r["success"] for r in rows):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+"""
+Parser benchmark suite
+
+Generates synthetic ICICI-layout statements (see bench/synth.py) and measures,
+for each size, the throughput, wall time and peak RSS of:
+
+- parse_cold:          icici_parser.parse with an empty page cache
+- parse_warm:          icici_parser.parse again, served from the page cache
+- extract_pdf_sample:  utils.helpers.extract_pdf_sample
+- detailed_compare:    utils.helpers.detailed_compare on a parsed frame vs. a
+                       copy with one changed value
+- test_parser:         utils.helpers.test_parser end to end (in-process, so
+                       its memory is attributed to the stage)
+
+Every stage runs in a fresh process so peak RSS is per stage. Results are
+written as JSON so runs can be compared across commits.
+
+Usage:
+    python -m bench.run_bench                         # 1, 100, 1000, 10000 pages
+    python -m bench.run_bench --pages 1 100 --out bench/results/local.json
+    python -m bench.run_bench --pages 100 --backend pymupdf
+    python -m bench.run_bench --compare old.json new.json
+"""
+
+import os, sys, json, time, argparse, platform, subprocess, tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from bench.synth import write_statement, ROWS_PER_PAGE
+from utils.backends import BACKENDS
+
+DATA_DIR = "bench/.data"
+STAGES = ["parse_cold", "parse_warm", "extract_pdf_sample", "detailed_compare", "test_parser"]
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+def _run_stage(stage: str, pdf_path: str, csv_path: str) -> dict:
+    """
+    Runs one stage in the current (fresh) process and times only the call.
+    """
+    import pandas as pd
+    from custom_parsers.icici_parser import parse
+    from utils.helpers import extract_pdf_sample, detailed_compare, test_parser
+
+    if stage == "detailed_compare":
+        df1 = pd.read_csv(csv_path)
+        df2 = df1.copy()
+        df2.iloc[len(df2) // 2, 4] += 1.0
+        call = lambda: detailed_compare(df1, df2)
+    else:
+        call = {
+            "parse_cold": lambda: parse(pdf_path),
+            "parse_warm": lambda: parse(pdf_path),
+            "extract_pdf_sample": lambda: extract_pdf_sample(pdf_path),
+            "test_parser": lambda: test_parser({"bank": "icici", "pdf_path": pdf_path, "csv_path": csv_path}),
+        }[stage]
+
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    result = call()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "ok": bool(result[0]) if stage == "test_parser" else True,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "baseline_rss_mb": round(rss_before, 1),
+    }
+
+def bench_size(pages: int) -> list[dict]:
+    """
+    Generates (or reuses) a statement of `pages` pages and benchmarks every stage.
+    """
+    out_dir = os.path.join(DATA_DIR, f"icici_{pages}")
+    pdf_path, csv_path = os.path.join(out_dir, "statement.pdf"), os.path.join(out_dir, "result.csv")
+    if not (os.path.exists(pdf_path) and os.path.exists(csv_path)):
+        start = time.perf_counter()
+        write_statement(out_dir, pages)
+        print(f"  generated {pages} pages in {time.perf_counter() - start:.1f}s")
+    rows = pages * ROWS_PER_PAGE
+
+    results = []
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="bench_page_cache_") as cache_dir:
+        os.environ["PAGE_CACHE_DIR"] = cache_dir
+        os.environ["SANDBOX"] = "0"
+        for stage in STAGES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                r = pool.submit(_run_stage, stage, pdf_path, csv_path).result()
+            r.update(stage=stage, pages=pages, rows=rows,
+                     pages_per_s=round(pages / r["seconds"], 2), rows_per_s=round(rows / r["seconds"], 1))
+            r["seconds"] = round(r["seconds"], 4)
+            print(f"  {stage:<20}{r['seconds']:>10.3f}s {r['pages_per_s']:>10.1f} pages/s "
+                  f"{r['rows_per_s']:>12.0f} rows/s {r['peak_rss_mb']:>8.0f} MB")
+            results.append(r)
+    return results
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(old_path: str, new_path: str) -> None:
+    """
+    Prints per-stage wall time and peak RSS changes between two result files.
+    """
+    with open(old_path) as f:
+        old = {(r["pages"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'pages':>6}  {'stage':<20}{'old s':>10}{'new s':>10}{'speedup':>9}{'old MB':>9}{'new MB':>9}")
+    for r in new["results"]:
+        o = old.get((r["pages"], r["stage"]))
+        if o:
+            print(f"{r['pages']:>6}  {r['stage']:<20}{o['seconds']:>10.3f}{r['seconds']:>10.3f}"
+                  f"{o['seconds'] / r['seconds']:>8.2f}x{o['peak_rss_mb']:>9.0f}{r['peak_rss_mb']:>9.0f}")
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark parsing helpers on synthetic statements.")
+    p.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 10000], help="Statement sizes in pages")
+    p.add_argument("--out", help="Result JSON path (default bench/results/<time>_<commit>.json)")
+    p.add_argument("--backend", choices=BACKENDS, default=os.getenv("PDF_BACKEND", "pdfplumber"),
+                   help="PDF text backend used by every stage")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = p.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.environ["PDF_BACKEND"] = args.backend
+    commit = _git_commit()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out = args.out or os.path.join("bench", "results", f"{stamp}_{commit or 'nogit'}.json")
+
+    results = []
+    for pages in args.pages:
+        print(f"{pages} pages:")
+        results.extend(bench_size(pages))
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"commit": commit, "timestamp": stamp, "backend": args.backend, "python": platform.python_version(),
+                   "platform": platform.platform(), "cpus": os.cpu_count(), "results": results}, f, indent=2)
+    print(f"\nResults written to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Agent startup benchmark
+
+Measures, in fresh interpreters, how long it takes to get from process start
+to the first LLM call:
+
+- import_s:        `import agent` (median over --repeat runs)
+- first_client_s:  import + build_graph() + llm.get_llm() for --provider,
+                   i.e. everything before the first request is sent
+- modules:         cumulative `python -X importtime` microseconds per module
+                   (median), for the heaviest modules
+
+Results are written as JSON; --compare prints the change in the totals and
+the largest per-module import time deltas between two result files.
+
+Usage:
+    python -m bench.startup                          # provider "fake"
+    python -m bench.startup --provider gemini --repeat 10
+    python -m bench.startup --compare old.json new.json
+"""
+
+import os, sys, json, argparse, statistics, subprocess
+from datetime import datetime, timezone
+
+from bench.run_bench import _git_commit
+
+FIRST_CLIENT = (
+    "import time; t0 = time.perf_counter()\n"
+    "import agent\n"
+    "from src import llm\n"
+    "t1 = time.perf_counter()\n"
+    "agent.build_graph()\n"
+    "llm.get_llm()\n"
+    "print(t1 - t0, time.perf_counter() - t0)\n"
+)
+
+
+def importtime(stmt: str = "import agent") -> dict[str, int]:
+    """
+    Runs `stmt` under `python -X importtime` and returns cumulative
+    microseconds per imported module.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", stmt],
+                          capture_output=True, text=True, check=True)
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        out[name.strip()] = int(cumulative)
+    return out
+
+def first_client(provider: str) -> tuple[float, float]:
+    """
+    Returns (import seconds, seconds until the LLM client exists) measured in
+    a fresh interpreter.
+    """
+    env = {**os.environ, "LLM_PROVIDER": provider}
+    proc = subprocess.run([sys.executable, "-c", FIRST_CLIENT], capture_output=True, text=True, check=True, env=env)
+    imported, ready = proc.stdout.split()[-2:]
+    return float(imported), float(ready)
+
+def measure(provider: str, repeat: int, top: int = 25) -> dict:
+    runs = [importtime() for _ in range(repeat)]
+    modules = {name: statistics.median(r.get(name, 0) for r in runs) for name in runs[-1]}
+    heaviest = dict(sorted(modules.items(), key=lambda kv: -kv[1])[:top])
+    timings = [first_client(provider) for _ in range(repeat)]
+    return {
+        "provider": provider,
+        "repeat": repeat,
+        "import_s": round(statistics.median(t[0] for t in timings), 4),
+        "first_client_s": round(statistics.median(t[1] for t in timings), 4),
+        "modules": heaviest,
+    }
+
+def compare(old_path: str, new_path: str, top: int = 15) -> None:
+    """
+    Prints total startup changes and the largest per-module import deltas.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for key in ("import_s", "first_client_s"):
+        print(f"{key:<16}{old[key]:>9.3f}s -> {new[key]:>7.3f}s  ({new[key] - old[key]:+.3f}s)")
+    names = set(old["modules"]) | set(new["modules"])
+    deltas = sorted(((new["modules"].get(n, 0) - old["modules"].get(n, 0), n) for n in names), key=lambda d: abs(d[0]),
+                    reverse=True)
+    print(f"\n{'module':<48}{'old ms':>9}{'new ms':>9}{'delta ms':>10}")
+    for delta, name in deltas[:top]:
+        print(f"{name:<48}{old['modules'].get(name, 0) / 1000:>9.1f}{new['modules'].get(name, 0) / 1000:>9.1f}"
+              f"{delta / 1000:>+10.1f}")
+
+def main():
+    from src.llm import PROVIDERS
+    p = argparse.ArgumentParser(description="Measure agent cold start with python -X importtime.")
+    p.add_argument("--provider", choices=list(PROVIDERS), default="fake", help="LLM provider to initialize")
+    p.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    p.add_argument("--out", help="Result JSON path (default bench/results/startup_<time>_<commit>.json)")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = p.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = _git_commit()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out = args.out or os.path.join("bench", "results", f"startup_{stamp}_{commit or 'nogit'}.json")
+    result = {"commit": commit, "timestamp": stamp, **measure(args.provider, args.repeat)}
+    print(f"import agent:        {result['import_s']:.3f}s")
+    print(f"first LLM client:    {result['first_client_s']:.3f}s ({args.provider})")
+    print("heaviest imports (cumulative ms):")
+    for name, us in list(result["modules"].items())[:10]:
+        print(f"  {name:<46}{us / 1000:>8.1f}")
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic ICICI-layout statement generator
+
+Writes a PDF that mimics `data/icici/icici_sample.pdf` (title line, bordered
+five-column table, 50 centered transaction rows per page, a running balance)
+together with the matching `result.csv`, so parsers and helpers can be
+benchmarked at any page count.
+
+Usage:
+    python -m bench.synth --pages 1000 --out bench/.data/icici_1000
+
+Requires PyMuPDF (already pinned in requirements.txt).
+"""
+
+import os, argparse, random
+from datetime import date, timedelta
+import pandas as pd
+
+COLUMNS = ["Date", "Description", "Debit Amt", "Credit Amt", "Balance"]
+DESCRIPTIONS = [
+    "Salary Credit XYZ Pvt Ltd", "IMPS UPI Payment Amazon", "Mobile Recharge Via UPI",
+    "Fuel Purchase Debit Card", "Electricity Bill NEFT Online", "Interest Credit Saving Account",
+    "Cheque Deposit Local Clearing", "Dining Out Card Swipe", "Credit Card Payment ICICI",
+    "NEFT Transfer To ABC Ltd", "EMI Auto Debit HDFC Bank", "Utility Bill Payment Electricity",
+    "Service Charge GST Debit", "Cash Deposit Branch Counter", "UPI QR Payment Groceries",
+    "ATM Cash Withdrawal India", "Online Card Purchase Flipkart", "NEFT Transfer From PQR Pvt",
+]
+ROWS_PER_PAGE = 50
+CELL_X = [11, 129, 247, 365, 483, 601]
+HEADER_TOP, ROW_HEIGHT, FONT_SIZE = 85.0, 13.1, 7.0
+
+
+def make_rows(n_rows: int, seed: int = 0) -> list[list]:
+    """
+    Builds `n_rows` random transactions with a consistent running balance.
+
+    Args:
+        n_rows (int): Number of transactions
+        seed (int): Random seed, so the same size always yields the same data
+
+    Returns:
+        list: Rows in COLUMNS order; the unused amount column is None
+    """
+    rng = random.Random(seed)
+    day, balance, rows = date(2024, 8, 1), round(rng.uniform(2000, 10000), 2), []
+    for _ in range(n_rows):
+        day += timedelta(days=rng.choice([0, 0, 1, 2, 3]))
+        amount = round(rng.uniform(100, 5000), 2)
+        credit = rng.random() < 0.5
+        balance = round(balance + amount if credit else balance - amount, 2)
+        rows.append([day.strftime("%d-%m-%Y"), rng.choice(DESCRIPTIONS),
+                     None if credit else amount, amount if credit else None, balance])
+    return rows
+
+def _cell_text(value) -> str:
+    return "" if value is None else str(value)
+
+def write_statement(out_dir: str, pages: int, seed: int = 0) -> tuple[str, str]:
+    """
+    Writes `<out_dir>/statement.pdf` and `<out_dir>/result.csv`.
+
+    Args:
+        out_dir (str): Output directory (created if needed)
+        pages (int): Number of PDF pages; each holds 50 transactions
+        seed (int): Random seed
+
+    Returns:
+        tuple: (pdf_path, csv_path)
+
+    Example:
+        >>> pdf, csv = write_statement("bench/.data/icici_100", pages=100)
+    """
+    import fitz
+
+    os.makedirs(out_dir, exist_ok=True)
+    pdf_path, csv_path = os.path.join(out_dir, "statement.pdf"), os.path.join(out_dir, "result.csv")
+    rows = make_rows(pages * ROWS_PER_PAGE, seed)
+
+    # Content streams are written directly: going through PyMuPDF's shape and
+    # text helpers costs ~0.1s per page, which is hours at 10,000 pages.
+    font = fitz.Font("helv")
+    advance = {chr(c): font.glyph_advance(c) for c in range(32, 127)}
+
+    def text_op(x0, x1, top, text, size):
+        width = sum(advance[ch] for ch in text) * size
+        x = x0 + (x1 - x0 - width) / 2 if x1 else x0
+        return f"BT /helv {size:g} Tf 1 0 0 1 {x:.3f} {792 - top:.3f} Tm ({text}) Tj ET"
+
+    doc = fitz.open()
+    title = "ChatGPT Powered Karbon Bannk"
+    title_x = (612 - sum(advance[ch] for ch in title) * 16) / 2
+    for p in range(pages):
+        page = doc.new_page(width=612, height=792)
+        page.insert_font(fontname="helv")
+        ops = ["0.5 w", text_op(title_x, None, 47, title, 16)]
+        table = [COLUMNS] + [[_cell_text(v) for v in r] for r in rows[p * ROWS_PER_PAGE:(p + 1) * ROWS_PER_PAGE]]
+        for i, cells in enumerate(table):
+            top = HEADER_TOP + i * ROW_HEIGHT
+            for c, text in enumerate(cells):
+                x0, x1 = CELL_X[c], CELL_X[c + 1]
+                ops.append(f"{x0} {792 - top - ROW_HEIGHT:.3f} {x1 - x0} {ROW_HEIGHT} re S")
+                if text:
+                    ops.append(text_op(x0, x1, top + 9.5, text, FONT_SIZE))
+        xref = doc.get_new_xref()
+        doc.update_object(xref, "<<>>")
+        doc.update_stream(xref, "\n".join(ops).encode())
+        page.set_contents(xref)
+    doc.save(pdf_path, garbage=3, deflate=True)
+    doc.close()
+
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(csv_path, index=False)
+    return pdf_path, csv_path
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a synthetic ICICI-layout statement.")
+    p.add_argument("--pages", type=int, required=True, help="Number of pages (50 rows each)")
+    p.add_argument("--out", required=True, help="Output directory")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = p.parse_args()
+    pdf, csvp = write_statement(args.out, args.pages, args.seed)
+    print(f"Wrote {pdf} and {csvp}")
+
+if __name__ == "__main__":
+    main()
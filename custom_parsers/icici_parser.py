@@ -1,76 +1,52 @@
 import pandas as pd
-import pdfplumber
 import re
-import numpy as np
+from utils.parallel import map_pages
+from utils.stream import iter_pages
+from utils.layout import load_layout, table_rows
 
-def parse(pdf_path: str) -> pd.DataFrame:
-    rows = []
-    date_pattern = re.compile(r'^\d{2}-\d{2}-\d{4}')
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                lines = text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    parts = line.split()
-                    if len(parts) < 4:
-                        continue
-                    if date_pattern.match(parts[0]):
-                        date = parts[0]
-                        description = ' '.join(parts[1:-3])
-                        amounts = parts[-3:]
-                        debit = np.nan
-                        credit = np.nan
-                        try:
-                            balance = float(amounts[-1])
-                            if '.' in amounts[-2] and '.' in amounts[-3]:
-                                # Both could be debit/credit; need logic
-                                first_amt = float(amounts[-3])
-                                second_amt = float(amounts[-2])
-                                # Assume one is debit, one is credit; use context or value
-                                # In bank statements, usually only one is non-zero
-                                if first_amt > 0 and second_amt == 0:
-                                    credit = first_amt
-                                elif second_amt > 0 and first_amt == 0:
-                                    credit = second_amt
-                                elif first_amt > 0:
-                                    debit = first_amt
-                                elif second_amt > 0:
-                                    credit = second_amt
-                            elif '.' in amounts[-2]:
-                                val = float(amounts[-2])
-                                # If balance decreased, likely debit
-                                if val < balance:
-                                    debit = val
-                                else:
-                                    credit = val
-                            else:
-                                val = float(amounts[-3])
-                                if val < balance:
-                                    debit = val
-                                else:
-                                    credit = val
-                        except (ValueError, IndexError):
-                            continue
-                        rows.append([
-                            date.strip(),
-                            description.strip(),
-                            round(debit, 2) if not pd.isna(debit) else np.nan,
-                            round(credit, 2) if not pd.isna(credit) else np.nan,
-                            round(balance, 2)
-                        ])
-    # Ensure exactly 100 rows
-    while len(rows) < 100:
-        rows.append(['01-01-2024', 'Missing Transaction', np.nan, np.nan, 0.0])
-    if len(rows) > 100:
-        rows = rows[:100]
-    df = pd.DataFrame(rows, columns=['Date', 'Description', 'Debit Amt', 'Credit Amt', 'Balance'])
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y').dt.strftime('%d-%m-%Y')
-    df['Debit Amt'] = pd.to_numeric(df['Debit Amt'], errors='coerce')
-    df['Credit Amt'] = pd.to_numeric(df['Credit Amt'], errors='coerce')
-    df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-    df['Description'] = df['Description'].astype(str).str.strip()
-    return df
\ No newline at end of file
+COLUMNS = ['Date', 'Description', 'Debit Amt', 'Credit Amt', 'Balance']
+AMOUNTS = ['Debit Amt', 'Credit Amt', 'Balance']
+DATE_PATTERN = r'\d{2}-\d{2}-\d{4}'
+
+def parse_page(page) -> list:
+    return table_rows(page, load_layout('icici'))
+
+def to_frame(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=COLUMNS, dtype=object).fillna('')
+    is_txn = df['Date'].str.strip().str.fullmatch(DATE_PATTERN)
+    txn = is_txn.cumsum()
+    keep = is_txn & (txn > 0)
+    if not is_txn.all():
+        # Lines without a date continue the previous transaction's description
+        description = df['Description'].groupby(txn).agg(' '.join)
+        df.loc[keep, 'Description'] = description.loc[txn[keep]].to_numpy()
+    df = df[keep].copy()
+    df['Date'] = df['Date'].str.strip()
+    df['Description'] = df['Description'].str.strip()
+    for col in AMOUNTS:
+        df[col] = pd.to_numeric(df[col].str.replace(',', '', regex=False).str.strip(), errors='coerce').astype(float).round(2)
+    df['Description'] = df['Description'].astype(str)
+    return df.reset_index(drop=True)
+
+def _chunks(df: pd.DataFrame, rows: bool):
+    if df.empty:
+        return
+    if rows:
+        yield from df.itertuples(index=False, name=None)
+    else:
+        yield df
+
+def parse_iter(pdf_path: str, rows: bool = False):
+    pending = []
+    for page_rows in iter_pages(pdf_path, parse_page):
+        pending += page_rows
+        # Hold back the last transaction: the next page may start with lines continuing its description
+        starts = [i for i, row in enumerate(pending) if re.fullmatch(DATE_PATTERN, row[0].strip())]
+        if len(starts) > 1:
+            yield from _chunks(to_frame(pending[:starts[-1]]), rows)
+            pending = pending[starts[-1]:]
+    yield from _chunks(to_frame(pending), rows)
+
+def parse(pdf_path: str, workers: int = 1) -> pd.DataFrame:
+    rows = [row for page_rows in map_pages(pdf_path, parse_page, workers) for row in page_rows]
+    return to_frame(rows)
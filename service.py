@@ -0,0 +1,229 @@
+"""
+service.py
+
+Local HTTP ingestion service that runs the generated bank parsers on
+uploaded statements. Runs fully offline on one box.
+
+Usage:
+    python service.py [--host 127.0.0.1] [--port 8000] [--workers N] [--queue-size N]
+
+Endpoints:
+    POST /parse/{bank}?format=ndjson|csv   Multipart upload (field "file") of
+         [&document=ID]                    one PDF; returns the parsed rows.
+                                           With a document id, pages already
+                                           parsed in that document's last
+                                           upload are reused (utils.incremental)
+    GET  /banks                            Banks with a parser under custom_parsers/
+    GET  /metrics                          Prometheus text: queue depth, in-flight
+                                           jobs, outcomes and latency
+    GET  /healthz                          Liveness check
+
+Functionality:
+- Uploads are written to a temporary file and queued on a bounded asyncio
+  queue. When the queue is full the request is rejected at once with 503 and
+  a Retry-After header (backpressure) instead of piling up in memory.
+- One dispatcher task per worker takes jobs off the queue and runs
+  `parse(pdf_path)` on a `utils.sandbox.SandboxPool`: long-lived,
+  resource-limited processes with pandas/pdfplumber preloaded that keep each
+  parser module loaded between requests (reloaded only when the parser file
+  changes, see `utils.registry`).
+- Once the parse has finished, the resulting DataFrame is sent back as
+  NDJSON (one JSON object per row) or CSV, encoded BATCH_ROWS rows at a time
+  so the response body is never held in memory as a whole. Rows are not
+  streamed while the PDF is still being parsed.
+
+Configuration (environment variables, overridden by the CLI flags):
+- SERVICE_WORKERS: worker processes (default SANDBOX_WORKERS)
+- SERVICE_QUEUE_SIZE: jobs waiting beyond the running ones (default 4 per worker)
+- SERVICE_TIMEOUT: wall-time limit per parse in seconds (default SANDBOX_TIMEOUT)
+
+Example:
+    curl -F file=@data/icici/icici_sample.pdf "http://127.0.0.1:8000/parse/icici?format=csv"
+"""
+
+import os, re, time, asyncio, argparse, tempfile
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from utils import sandbox, registry
+
+WORKERS = int(os.getenv("SERVICE_WORKERS", sandbox.WORKERS))
+QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", 4 * WORKERS))
+TIMEOUT = float(os.getenv("SERVICE_TIMEOUT", sandbox.TIMEOUT))
+BATCH_ROWS = 1000
+BANK_NAME = re.compile(r"^[a-z0-9_]+$")
+
+
+class Metrics:
+    """Request counters and a window of recent latencies for /metrics."""
+
+    def __init__(self, window: int = 1000):
+        self.outcomes = {"ok": 0, "failed": 0, "rejected": 0}
+        self.in_flight = 0
+        self.rows = 0
+        self.wait = deque(maxlen=window)
+        self.parse = deque(maxlen=window)
+        self.wait_total = self.parse_total = 0.0
+
+    def observe(self, wait: float, parse: float, rows: int, ok: bool) -> None:
+        self.outcomes["ok" if ok else "failed"] += 1
+        self.rows += rows
+        self.wait.append(wait)
+        self.parse.append(parse)
+        self.wait_total += wait
+        self.parse_total += parse
+
+    def render(self, queue_depth: int, queue_size: int) -> str:
+        def quantiles(name: str, values: deque, total: float) -> list[str]:
+            ordered = sorted(values)
+            lines = [f"# TYPE {name} summary"]
+            for q in (0.5, 0.9, 0.99):
+                v = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0
+                lines.append(f'{name}{{quantile="{q}"}} {v:.6f}')
+            done = self.outcomes["ok"] + self.outcomes["failed"]
+            return lines + [f"{name}_sum {total:.6f}", f"{name}_count {done}"]
+
+        return "\n".join([
+            "# HELP service_queue_depth Jobs waiting for a worker.",
+            "# TYPE service_queue_depth gauge",
+            f"service_queue_depth {queue_depth}",
+            "# HELP service_queue_capacity Maximum jobs waiting before uploads are rejected.",
+            "# TYPE service_queue_capacity gauge",
+            f"service_queue_capacity {queue_size}",
+            "# HELP service_in_flight Jobs currently being parsed.",
+            "# TYPE service_in_flight gauge",
+            f"service_in_flight {self.in_flight}",
+            "# HELP service_requests_total Parse requests by outcome.",
+            "# TYPE service_requests_total counter",
+            *(f'service_requests_total{{outcome="{k}"}} {v}' for k, v in self.outcomes.items()),
+            "# HELP service_rows_total Transaction rows returned.",
+            "# TYPE service_rows_total counter",
+            f"service_rows_total {self.rows}",
+            "# HELP service_queue_wait_seconds Time from upload to a worker picking the job up.",
+            *quantiles("service_queue_wait_seconds", self.wait, self.wait_total),
+            "# HELP service_parse_seconds Time spent parsing in a worker.",
+            *quantiles("service_parse_seconds", self.parse, self.parse_total),
+        ]) + "\n"
+
+
+async def _dispatch(app: FastAPI) -> None:
+    """
+    Dispatcher loop: runs queued jobs on the worker pool, one at a time.
+    """
+    queue, pool, metrics = app.state.queue, app.state.pool, app.state.metrics
+    while True:
+        parser_path, pdf_path, document, enqueued, future = await queue.get()
+        started = time.perf_counter()
+        metrics.in_flight += 1
+        try:
+            ok, value = await asyncio.wrap_future(pool.submit(sandbox.parse_file, parser_path, pdf_path, document,
+                                                              timeout=app.state.timeout))
+        except Exception as e:
+            ok, value = False, {"type": type(e).__name__, "message": str(e), "traceback": ""}
+        finally:
+            metrics.in_flight -= 1
+            queue.task_done()
+        done = time.perf_counter()
+        metrics.observe(started - enqueued, done - started, len(value) if ok else 0, ok)
+        if not future.cancelled():
+            future.set_result((ok, value))
+
+def _stream(df, fmt: str):
+    """
+    Yields the DataFrame in BATCH_ROWS-row chunks as NDJSON lines or CSV.
+    """
+    if fmt == "csv":
+        yield df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(df), BATCH_ROWS):
+        chunk = df.iloc[start:start + BATCH_ROWS]
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=False)
+        else:
+            text = chunk.to_json(orient="records", lines=True, date_format="iso")
+            yield text if text.endswith("\n") else text + "\n"
+
+def create_app(workers: int = WORKERS, queue_size: int = QUEUE_SIZE, timeout: float = TIMEOUT) -> FastAPI:
+    """
+    Builds the FastAPI app; the worker pool and dispatchers start with it.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.pool = sandbox.SandboxPool(workers=workers, timeout=timeout)
+        app.state.queue = asyncio.Queue(maxsize=queue_size)
+        app.state.metrics = Metrics()
+        app.state.timeout = timeout
+        dispatchers = [asyncio.create_task(_dispatch(app)) for _ in range(workers)]
+        try:
+            yield
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            app.state.pool.close()
+
+    app = FastAPI(title="Bank statement parser service", lifespan=lifespan)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/banks")
+    async def banks():
+        return {"banks": registry.banks()}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return app.state.metrics.render(app.state.queue.qsize(), app.state.queue.maxsize)
+
+    def reject():
+        app.state.metrics.outcomes["rejected"] += 1
+        raise HTTPException(503, "Parse queue is full, retry later", headers={"Retry-After": "1"})
+
+    @app.post("/parse/{bank}")
+    async def parse(bank: str, file: UploadFile = File(...), format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                    document: str | None = Query(None, max_length=200)):
+        parser_path = registry.parser_path(bank)
+        if not BANK_NAME.match(bank) or not os.path.exists(parser_path):
+            raise HTTPException(404, f"No parser for bank {bank!r}")
+        # Checked before reading the upload to fail fast, and again on enqueue:
+        # other requests may fill the queue while a large body is being read.
+        if app.state.queue.full():
+            reject()
+
+        fd, pdf_path = tempfile.mkstemp(prefix=f"{bank}_", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while block := await file.read(1 << 20):
+                    f.write(block)
+            future = asyncio.get_running_loop().create_future()
+            try:
+                app.state.queue.put_nowait((os.path.abspath(parser_path), pdf_path, document and f"{bank}:{document}",
+                                            time.perf_counter(), future))
+            except asyncio.QueueFull:
+                reject()
+            ok, value = await future
+        finally:
+            os.remove(pdf_path)
+
+        if not ok:
+            return JSONResponse({"error": value["type"], "message": value["message"]}, status_code=422)
+        media = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(_stream(value, format), media_type=media,
+                                 headers={"X-Row-Count": str(len(value))})
+
+    return app
+
+def main():
+    p = argparse.ArgumentParser(description="Serve the generated bank parsers over HTTP.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=WORKERS, help="Parser worker processes")
+    p.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Waiting jobs before uploads get 503")
+    p.add_argument("--timeout", type=float, default=TIMEOUT, help="Wall-time limit per parse in seconds")
+    args = p.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.workers, args.queue_size, args.timeout), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+SQLite checkpointing for the agent graph
+
+`SqliteSaver` is a `langgraph.checkpoint.base.BaseCheckpointSaver` stored in a
+single SQLite file (CHECKPOINT_DB, default .cache/checkpoints.sqlite), so a run
+that crashes or is killed resumes from the last completed node with its code,
+feedback and iteration count instead of starting again from iteration 0.
+
+Every run is a LangGraph thread whose id starts with the bank and a hash of
+its input files ("icici:<inputs>:<started>"), so runs of the same bank on the
+same PDF/CSV can be found and resumed, and past runs can be listed per bank:
+
+    python agent.py --target icici --resume
+    python agent.py --runs icici
+"""
+
+from __future__ import annotations
+
+import os, time, sqlite3, threading
+from collections.abc import Iterator, Sequence
+import xxhash
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint,
+    CheckpointMetadata, CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata,
+)
+from utils.page_cache import file_digest
+
+DB_PATH = os.getenv("CHECKPOINT_DB", ".cache/checkpoints.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    bank TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created REAL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_bank ON checkpoints (bank, created);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+def input_key(bank: str, pdf_path: str, csv_path: str) -> str:
+    """
+    Returns the "<bank>:<hash>" prefix shared by every run on the same inputs.
+    """
+    return f"{bank}:{xxhash.xxh3_64(file_digest(pdf_path) + file_digest(csv_path)).hexdigest()}"
+
+def new_thread_id(bank: str, pdf_path: str, csv_path: str) -> str:
+    return f"{input_key(bank, pdf_path, csv_path)}:{time.time_ns()}"
+
+
+class SqliteSaver(BaseCheckpointSaver[int]):
+    """
+    Synchronous SQLite checkpointer; one connection shared by all graph
+    threads behind a lock (batch mode runs several banks at once).
+
+    Example:
+        >>> saver = SqliteSaver()
+        >>> agent = build_graph(saver)
+        >>> agent.invoke(state, {"configurable": {"thread_id": new_thread_id("icici", pdf, csv)}})
+    """
+
+    def __init__(self, path: str | None = None, *, serde=None):
+        super().__init__(serde=serde)
+        self.path = path or DB_PATH
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _query(self, sql: str, params=()) -> list:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _tuple(self, thread_id, ns, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, meta_type, meta = row
+        writes = self._query(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id=? AND checkpoint_ns=? "
+            "AND checkpoint_id=? ORDER BY task_id, idx", (thread_id, ns, checkpoint_id))
+        conf = lambda cid: {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": cid}}
+        return CheckpointTuple(
+            config=conf(checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            parent_config=conf(parent_id) if parent_id else None,
+            pending_writes=[(task, channel, self.serde.loads_typed((t, v))) for task, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        cols = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._query(f"SELECT {cols} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+                               "AND checkpoint_id=?", (thread_id, ns, checkpoint_id))
+        else:
+            rows = self._query(f"SELECT {cols} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+                               "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, ns))
+        return self._tuple(thread_id, ns, rows[0]) if rows else None
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+               "metadata_type, metadata FROM checkpoints WHERE 1=1")
+        params = []
+        if config:
+            sql += " AND thread_id=?"
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                sql += " AND checkpoint_ns=?"
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                sql += " AND checkpoint_id=?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            sql += " AND checkpoint_id<?"
+            params.append(before_id)
+        sql += " ORDER BY checkpoint_id DESC"
+        for thread_id, ns, *row in self._query(sql, params):
+            t = self._tuple(thread_id, ns, row)
+            if filter and not all(t.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield t
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        meta_type, meta = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 thread_id.split(":")[0], type_, blob, meta_type, meta, time.time()))
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes: Sequence[tuple[str, object]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for i, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, i)
+            rows.append((thread_id, ns, checkpoint_id, task_id, idx, channel,
+                         *self.serde.dumps_typed(value), task_path, idx >= 0))
+        with self.lock, self.conn:
+            for *row, keep_existing in rows:
+                verb = "INSERT OR IGNORE" if keep_existing else "INSERT OR REPLACE"
+                self.conn.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id=?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id=?", (thread_id,))
+
+    def threads(self, prefix: str) -> list[str]:
+        """
+        Returns the ids of runs whose thread id starts with `prefix`
+        (a bank or an `input_key`), newest first.
+        """
+        bank = prefix.split(":")[0]
+        rows = self._query("SELECT thread_id, MAX(created) FROM checkpoints WHERE bank=? AND checkpoint_ns='' "
+                           "GROUP BY thread_id ORDER BY 2 DESC", (bank,))
+        return [t for t, _ in rows if t == prefix or t.startswith(prefix + ":")]
+
+    def runs(self, bank: str) -> list[dict]:
+        """
+        Summarizes past runs of a bank from their latest checkpoints.
+
+        Returns:
+            list: One dict per run, newest first, with "thread_id", "started",
+                  "updated" (epoch seconds), "iterations", "success" and "steps"
+        """
+        out = []
+        for thread_id in self.threads(bank):
+            started, updated, steps = self._query(
+                "SELECT MIN(created), MAX(created), COUNT(*) FROM checkpoints WHERE thread_id=? "
+                "AND checkpoint_ns=''", (thread_id,))[0]
+            values = self.get_tuple({"configurable": {"thread_id": thread_id}}).checkpoint["channel_values"]
+            out.append({"thread_id": thread_id, "started": started, "updated": updated, "steps": steps,
+                        "iterations": values.get("iterations", 0), "success": bool(values.get("success"))})
+        return out
@@ -11,7 +11,9 @@ Modules used:
 - state.AgentState: Custom state class defining workflow data structure
 
 Workflow Overview:
-1. START → plan_generate (Plan test strategy)
+0. START → preflight (Try existing parsers with similar layouts; if one
+   passes it is adopted and the run ends without any LLM call)
+1. preflight → plan_generate (Plan test strategy)
 2. plan → execute_test (Run test execution)
 3. test → Conditional (Based on decide_next)
    - If requires replanning → back to plan
@@ -22,11 +24,16 @@ The graph forms a feedback loop for iterative test planning and execution.
 
 from langgraph.graph import StateGraph, START, END
 from src.state import AgentState
-from src.nodes import plan_generate, execute_test, decide_next
+from src.nodes import preflight, after_preflight, plan_generate, execute_test, decide_next
 
-def build_graph():
+def build_graph(checkpointer=None):
     """
     Build and configure the state graph workflow.
+
+    Args:
+        checkpointer: Optional LangGraph checkpointer (see src.checkpoint);
+                      with one, every node's output is persisted per thread
+                      and an interrupted run can be resumed
     
     Returns:
         Compiled LangGraph graph ready for execution
@@ -34,14 +41,20 @@ def build_graph():
     graph = StateGraph(AgentState)
     
     # Register core workflow nodes
+    graph.add_node("preflight", preflight)   # Tries existing parsers before the LLM
     graph.add_node("plan", plan_generate)    # Plans test strategy and test steps
     graph.add_node("test", execute_test)     # Executes test plan and collects results
     
-    # Set workflow entry point at planning phase
-    graph.set_entry_point("plan")
+    # Set workflow entry point at the preflight check
+    graph.set_entry_point("preflight")
     
     # Define workflow structure
-    graph.add_edge(START, "plan")          # Initial edge from START node
+    graph.add_edge(START, "preflight")     # Initial edge from START node
+    graph.add_conditional_edges(
+        "preflight",
+        after_preflight,                  # Adopted an existing parser?
+        {"plan": "plan", "end": END}
+    )
     graph.add_edge("plan", "test")         # Plan → Execute sequence
     graph.add_conditional_edges(
         "test", 
@@ -50,7 +63,7 @@ def build_graph():
     )
     
     # Return compiled graph ready for execution
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
 
@@ -0,0 +1,270 @@
+"""
+LLM client and response cache
+
+Key features:
+- One reusable chat client per (model, temperature) per process
+- Persistent response cache keyed by a hash of provider, model, temperature
+  and prompt; the offline "fake" provider is never cached
+- Replay mode that serves every call from the cache and never touches the API
+- Async completion for generating several candidates concurrently
+- Provider registry: gemini (default), cerebras, groq, openai, together and
+  an offline "fake" that returns canned parser code. A provider's SDK and
+  API key are imported only when it is selected (LLM_PROVIDER env var or
+  `agent.py --provider`), so startup never pays for unused SDKs.
+- Retries with exponential backoff (LLM_MAX_RETRIES, default 2), and a trace
+  span per call with latency, token counts, retries and cache hits
+
+Cache modes (LLM_CACHE env var or `agent.py --llm-cache`):
+- "on":     read from the cache, call the LLM on a miss and store the answer
+- "off":    always call the LLM, never read or write the cache
+- "replay": serve only from the cache; a miss raises ReplayMiss
+"""
+
+import os, json, time, glob, asyncio, threading
+from functools import lru_cache
+from types import SimpleNamespace
+import xxhash
+from utils import trace
+from utils.prompt import count_tokens
+
+PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+FAKE_RESPONSES = os.getenv("FAKE_LLM_RESPONSES", "custom_parsers")
+MODEL = os.getenv("LLM_MODEL", "")  # empty: the provider's default model
+TEMPERATURE = 0.4
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache/llm")
+CACHE_MODE = os.getenv("LLM_CACHE", "on")
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "1.0"))
+CACHE_VERSION = 2  # bump when the cache key changes, so old entries are never served
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when a prompt has no cached response."""
+
+
+class FakeChat:
+    """
+    Offline chat client that cycles through canned responses.
+
+    Supports the `invoke`/`ainvoke` subset of the LangChain chat interface used
+    by this module, so the whole pipeline can run without network or API key.
+    """
+
+    def __init__(self, responses: list[str]):
+        self.responses = responses
+        self.calls = 0
+
+    @classmethod
+    def from_path(cls, path: str) -> "FakeChat":
+        """Loads canned responses from a file or from every *.py file in a directory."""
+        files = sorted(glob.glob(os.path.join(path, "*.py"))) if os.path.isdir(path) else [path]
+        responses = []
+        for fp in files:
+            with open(fp) as f:
+                responses.append(f.read())
+        return cls(responses)
+
+    def invoke(self, messages):
+        text = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return SimpleNamespace(content=text)
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def _gemini(model: str, temperature: float):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from keys import GEMINI_API_KEY
+    return ChatGoogleGenerativeAI(model=model, temperature=temperature, api_key=GEMINI_API_KEY)
+
+def _cerebras(model: str, temperature: float):
+    from langchain_cerebras import ChatCerebras
+    from keys import CEREBRAS_API_KEY
+    return ChatCerebras(model=model, temperature=temperature, api_key=CEREBRAS_API_KEY)
+
+def _groq(model: str, temperature: float):
+    from langchain_groq import ChatGroq
+    from keys import GROQ_API_KEY
+    return ChatGroq(model=model, temperature=temperature, api_key=GROQ_API_KEY)
+
+def _openai(model: str, temperature: float):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"))
+
+def _together(model: str, temperature: float):
+    from langchain_together import ChatTogether
+    from keys import TOGETHER_API_KEY
+    return ChatTogether(model=model, temperature=temperature, api_key=TOGETHER_API_KEY)
+
+def _fake(model: str, temperature: float):
+    return FakeChat.from_path(FAKE_RESPONSES)
+
+# name -> (client factory, default model)
+PROVIDERS = {
+    "gemini": (_gemini, "gemini-2.5-flash"),
+    "cerebras": (_cerebras, "llama-3.3-70b"),
+    "groq": (_groq, "llama-3.3-70b-versatile"),
+    "openai": (_openai, "gpt-4o-mini"),
+    "together": (_together, "meta-llama/Llama-3.3-70B-Instruct-Turbo"),
+    "fake": (_fake, "fake"),
+}
+
+def default_model() -> str:
+    """
+    Returns LLM_MODEL if set, otherwise the selected provider's default model.
+    """
+    if PROVIDER not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {PROVIDER!r}; expected one of {list(PROVIDERS)}")
+    return MODEL or PROVIDERS[PROVIDER][1]
+
+@lru_cache(maxsize=None)
+def _client(provider: str, model: str, temperature: float):
+    return PROVIDERS[provider][0](model, temperature)
+
+_loops = threading.local()
+
+def run_async(coro):
+    """
+    Runs a coroutine to completion on this thread's long-lived event loop.
+
+    Clients are cached for the whole run (see `get_llm`) and their async
+    transports stay bound to the loop they were first used on, so every
+    iteration must reuse that loop; `asyncio.run` would close it each time.
+    """
+    loop = getattr(_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+def get_llm(model: str | None = None, temperature: float = TEMPERATURE):
+    """
+    Returns the process-wide chat client for the selected provider and a
+    model/temperature pair.
+
+    The provider's SDK is imported and the client created on first use; the
+    client is reused by every later iteration.
+    """
+    model = model or default_model()
+    return _client(PROVIDER, model, temperature)
+
+def cache_key(prompt: str, model: str | None = None, temperature: float = TEMPERATURE, variant: int = 0) -> str:
+    """
+    Hashes everything that determines an LLM response into a cache key.
+
+    `variant` distinguishes concurrent candidates generated from the same
+    prompt; it is left out of the key for the default single candidate.
+    """
+    key = {"version": CACHE_VERSION, "provider": PROVIDER, "model": model or default_model(),
+           "temperature": temperature, "prompt": prompt}
+    if variant:
+        key["variant"] = variant
+    payload = json.dumps(key, sort_keys=True)
+    return xxhash.xxh3_128(payload.encode()).hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+def _cache_mode() -> str:
+    # canned responses cost nothing to regenerate and must not be replayed for a real provider
+    return "off" if PROVIDER == "fake" else CACHE_MODE
+
+def _read_cache(path: str):
+    mode = _cache_mode()
+    if mode != "off" and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["response"]
+    if mode == "replay":
+        raise ReplayMiss(f"No cached LLM response for this prompt ({path}); run once with LLM_CACHE=on")
+    return None
+
+def _write_cache(path: str, prompt: str, text: str, model: str, temperature: float) -> None:
+    if _cache_mode() == "off":
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"model": model, "temperature": temperature, "created": time.time(),
+                   "prompt": prompt, "response": text}, f)
+    os.replace(tmp, path)
+
+def _token_counts(message, prompt: str, text: str) -> dict:
+    """
+    Returns prompt/response token counts, from the provider's usage metadata
+    when it reports them and counted locally otherwise.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {"prompt_tokens": usage.get("input_tokens") or count_tokens(prompt),
+            "response_tokens": usage.get("output_tokens") or count_tokens(text)}
+
+def _invoke(llm, prompt: str, attrs: dict):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            attrs["retries"] = attempt
+            return llm.invoke([("user", prompt)])
+        except Exception:
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(RETRY_BACKOFF_S * 2 ** attempt)
+
+async def _ainvoke(llm, prompt: str, attrs: dict):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            attrs["retries"] = attempt
+            return await llm.ainvoke([("user", prompt)])
+        except Exception:
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF_S * 2 ** attempt)
+
+def complete(prompt: str, model: str | None = None, temperature: float = TEMPERATURE, variant: int = 0) -> str:
+    """
+    Sends a single user prompt to the LLM, going through the response cache.
+
+    Args:
+        prompt (str): Full prompt text from `create_prompt`
+        model (str | None): Model name; defaults to `default_model()`
+        temperature (float): Sampling temperature
+        variant (int): Candidate index when several answers are wanted for
+                       the same prompt
+
+    Returns:
+        str: Raw response text
+
+    Raises:
+        ReplayMiss: In replay mode, when the prompt has not been seen before
+        Exception: The provider's error once MAX_RETRIES retries are used up
+
+    Example:
+        >>> complete("Write a parser...")   # first run calls the API
+        >>> complete("Write a parser...")   # served from .cache/llm
+    """
+    model = model or default_model()
+    with trace.span("llm.complete", provider=PROVIDER, model=model, variant=variant) as attrs:
+        path = _cache_path(cache_key(prompt, model, temperature, variant))
+        text = _read_cache(path)
+        attrs["cached"] = text is not None
+        message = None
+        if text is None:
+            message = _invoke(get_llm(model, temperature), prompt, attrs)
+            text = message.content
+            _write_cache(path, prompt, text, model, temperature)
+        attrs.update(_token_counts(message, prompt, text))
+    return text
+
+async def acomplete(prompt: str, model: str | None = None, temperature: float = TEMPERATURE, variant: int = 0) -> str:
+    """
+    Async counterpart of `complete`, used to request several candidates at once.
+    """
+    model = model or default_model()
+    with trace.span("llm.acomplete", provider=PROVIDER, model=model, variant=variant) as attrs:
+        path = _cache_path(cache_key(prompt, model, temperature, variant))
+        text = _read_cache(path)
+        attrs["cached"] = text is not None
+        message = None
+        if text is None:
+            message = await _ainvoke(get_llm(model, temperature), prompt, attrs)
+            text = message.content
+            _write_cache(path, prompt, text, model, temperature)
+        attrs.update(_token_counts(message, prompt, text))
+    return text
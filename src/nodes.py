@@ -2,76 +2,234 @@
 Core workflow functions for AI-powered parser generation and execution
 
 Key features:
-- Uses Cerebras AI for code generation
+- Generates code with the configured LLM provider (see src/llm.py)
 - Implements a 3-iteration maximum planning loop
 - Generates bank-specific parser modules
 - Automates testing with custom validation
 - Adds required imports to generated code
 """
 
-import os, re
-from langchain_cerebras import ChatCerebras
-from utils.prompt import create_prompt
+import os, re, asyncio, tempfile, contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.prompt import build_prompt
 from utils.helpers import test_parser
-from keys import GEMINI_API_KEY
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.registry import write_parser, parser_path
+from utils.layout import rank_parsers
+from utils.trace import timed, span
+from utils import sandbox
+from src.llm import complete, acomplete, run_async
 
+PREFLIGHT_PARSERS = int(os.getenv("PREFLIGHT_PARSERS", "3"))
+# Layout similarity below which an existing parser is neither tried nor used
+# as a reference; 0.5 takes at least the same set of columns
+PREFLIGHT_MIN_SIMILARITY = float(os.getenv("PREFLIGHT_MIN_SIMILARITY", "0.5"))
 
+# Imports for the names generated code may use (see utils/prompt.py); only
+# the ones it uses without importing them are added
+IMPORTS = {
+    "pd": "import pandas as pd", "pdfplumber": "import pdfplumber", "re": "import re", "np": "import numpy as np",
+    "map_pages": "from utils.parallel import map_pages", "iter_pages": "from utils.stream import iter_pages",
+    "page_text": "from utils.page_cache import page_text", "page_words": "from utils.page_cache import page_words",
+    "load_layout": "from utils.layout import load_layout", "table_rows": "from utils.layout import table_rows",
+}
+
+def clean_code(code: str) -> str:
+    """
+    Strips markdown fences from an LLM response and adds the imports of the
+    allowed names it uses but does not import.
+    """
+    code = code.strip()
+    code = re.sub(r"^```python", "", code)
+    code = re.sub(r"^```", "", code)
+    code = re.sub(r"```$", "", code).strip()
+
+    for name, imp in reversed(IMPORTS.items()):
+        used = re.search(rf"\b{name}\b", code)
+        imported = re.search(rf"^\s*(import|from)\s.*\b{name}\b", code, re.M)
+        if used and not imported:
+            code = imp + "\n" + code
+    return code
+
+async def _generate_candidates(prompt: str, n: int) -> list[str]:
+    return await asyncio.gather(*(acomplete(prompt, variant=i) for i in range(n)))
+
+
+def _rebind_layout(code: str, old: str, new: str) -> str:
+    """Points a parser's `load_layout('<old>')` calls at another bank's fingerprint."""
+    return re.sub(rf"""load_layout\((['"]){re.escape(old)}\1\)""", f"load_layout('{new}')", code)
+
+def _try_parser(state, bank: str, similarity: float) -> tuple[bool, str]:
+    with span("preflight.candidate", bank=bank, similarity=similarity) as attrs:
+        ok, fb = test_parser(state)
+        attrs["passed"] = ok
+    return ok, fb
+
+@timed("node.preflight")
+def preflight(state):
+    """
+    Tries the existing parsers on a new bank before any LLM call.
+
+    Existing banks are ranked by how closely their stored layout fingerprint
+    matches the new sample's (see `utils.layout.rank_parsers`). The top
+    PREFLIGHT_PARSERS (default 3) parsers scoring at least
+    PREFLIGHT_MIN_SIMILARITY are tested in parallel against the new bank's
+    samples; nothing is tried when the sample has no layout fingerprint.
+
+    Each parser is first rebound to the new bank's layout (its
+    `load_layout('<bank>')` calls are renamed), so it is tested exactly as it
+    would run once adopted. The first passing one, in rank order, is adopted
+    as the bank's parser with zero LLM calls. Otherwise the closest one and
+    its test feedback seed the first prompt as "reference".
+
+    Every test is recorded as a "preflight.candidate" span (see
+    `utils.trace`) with the parser's bank, similarity and result.
+    """
+    if state.get("code") or state["iterations"] or PREFLIGHT_PARSERS <= 0 or not state.get("layout"):
+        return state
+    ranked = [(score, bank) for score, bank in rank_parsers(state["layout"], exclude=state["bank"])
+              if score >= PREFLIGHT_MIN_SIMILARITY][:PREFLIGHT_PARSERS]
+    if not ranked:
+        return state
+
+    codes = []
+    for _, bank in ranked:
+        with open(parser_path(bank)) as f:
+            codes.append(_rebind_layout(f.read(), bank, state["bank"]))
+    with tempfile.TemporaryDirectory(prefix=f"{state['bank']}_preflight_") as tmp, \
+            ThreadPoolExecutor(max_workers=len(ranked)) as pool:
+        futures = []
+        for (score, bank), code in zip(ranked, codes):
+            path = os.path.join(tmp, f"{bank}_parser.py")
+            with open(path, "w") as f:
+                f.write(code)
+            futures.append(pool.submit(contextvars.copy_context().run, _try_parser,
+                                       {**state, "parser_path": path}, bank, score))
+        results = [f.result() for f in futures]
+
+    winner = next((i for i, (ok, _) in enumerate(results) if ok), None)
+    if winner is not None:
+        state["code"] = codes[winner]
+        write_parser(state["bank"], state["code"])
+        state["success"] = True
+        state["feedback_msg"] = results[winner][1]
+        state["adopted_from"] = ranked[winner][1]
+    else:
+        state["reference"] = {"bank": ranked[0][1], "similarity": ranked[0][0], "code": codes[0]}
+        state["feedback_msg"] = results[0][1]
+    return state
+
+def after_preflight(state):
+    """
+    Ends the run when preflight adopted an existing parser, otherwise plans.
+    """
+    return "end" if state["success"] else "plan"
+
+@timed("node.plan")
 def plan_generate(state):
     """
     Core workflow functions for AI-powered parser generation and execution
 
     Key features:
-    - Uses Cerebras AI for code generation
+    - Generates code with the configured LLM provider (see src/llm.py)
     - Implements a 3-iteration maximum planning loop
     - Generates bank-specific parser modules
     - Automates testing with custom validation
     - Adds required imports to generated code
     """
     state["iterations"] += 1
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.4, api_key=GEMINI_API_KEY)
-
-    prompt = create_prompt(state)
-    resp = llm.invoke([("user", prompt)])
-    code = resp.content.strip()
-
-    code = re.sub(r"^```python", "", code)
-    code = re.sub(r"^```", "", code)
-    code = re.sub(r"```$", "", code).strip()
 
-    required_imports = ["import pandas as pd", "import pdfplumber", "import re", "import numpy as np"]
-    for imp in reversed(required_imports):
-        if imp not in code:
-            code = imp + "\n" + code
-
-    state["code"] = code
+    with span("prompt.build", iteration=state["iterations"]) as attrs:
+        prompt, stats = build_prompt(state)
+        attrs.update(stats)
+    n = state.get("candidates", 1)
+    if n > 1:
+        state["candidate_codes"] = [clean_code(c) for c in run_async(_generate_candidates(prompt, n))]
+        state["code"] = state["candidate_codes"][0]
+    else:
+        state["code"] = clean_code(complete(prompt))
     return state
 
+@timed("node.test")
 def execute_test(state):
     """
     Core workflow functions for AI-powered parser generation and execution
 
     Key features:
-    - Uses Cerebras AI for code generation
+    - Generates code with the configured LLM provider (see src/llm.py)
     - Implements a 3-iteration maximum planning loop
     - Generates bank-specific parser modules
     - Automates testing with custom validation
     - Adds required imports to generated code
     """
-    os.makedirs("custom_parsers", exist_ok=True)
-    with open(f"custom_parsers/{state['bank']}_parser.py", "w") as f:
-        f.write(state["code"])
+    if len(state.get("candidate_codes") or []) > 1:
+        return _test_candidates(state)
+    write_parser(state["bank"], state["code"])
     ok, fb = test_parser(state)
     state["success"] = ok
     state["feedback_msg"] = fb
     return state
 
+def _test_candidates(state):
+    """
+    Tests every candidate parser concurrently; `test_parser` runs each one in
+    its own sandbox worker process.
+
+    Results are collected as they finish. As soon as one candidate passes,
+    the others are cancelled and their sandbox workers killed and replaced
+    (see `utils.sandbox.cancel_scope`), so they stop using CPU while the run
+    goes on; with SANDBOX=0 they run to completion in the background. The
+    passing candidate becomes the bank's parser. When none
+    pass, the first candidate that ran without an exception leads the
+    feedback and the other candidates' results are appended as runner-ups.
+    """
+    codes = state["candidate_codes"]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f"{state['bank']}_candidates_") as tmp, sandbox.cancel_scope() as scope:
+        pool = ThreadPoolExecutor(max_workers=len(codes))
+        futures = {}
+        for i, code in enumerate(codes):
+            path = os.path.join(tmp, f"{state['bank']}_parser_{i}.py")
+            with open(path, "w") as f:
+                f.write(code)
+            # Copy the context per task so each thread records into the run's trace.
+            ctx = contextvars.copy_context()
+            futures[pool.submit(ctx.run, test_parser, {**state, "parser_path": path})] = i
+        try:
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    results[i] = (False, f"ERROR DURING TEST: candidate worker failed: {e}")
+                if results[i][0]:
+                    break
+        finally:
+            scope.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    winner = next((i for i, (ok, _) in results.items() if ok), None)
+    if winner is None:
+        ran = [i for i in sorted(results) if not results[i][1].startswith("ERROR")]
+        winner = ran[0] if ran else min(results)
+        others = [f"- Candidate {i + 1}: {results[i][1][:500]}" for i in sorted(results) if i != winner]
+        fb = results[winner][1]
+        if others:
+            fb += "\n\nOther candidates tried this round:\n" + "\n".join(others)
+    else:
+        fb = results[winner][1]
+
+    state["code"] = codes[winner]
+    write_parser(state["bank"], state["code"])
+    state["success"] = results[winner][0]
+    state["feedback_msg"] = fb
+    return state
+
 def decide_next(state):
     """
     Core workflow functions for AI-powered parser generation and execution
 
     Key features:
-    - Uses Cerebras AI for code generation
+    - Generates code with the configured LLM provider (see src/llm.py)
     - Implements a 3-iteration maximum planning loop
     - Generates bank-specific parser modules
     - Automates testing with custom validation
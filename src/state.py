@@ -1,5 +1,5 @@
 
-from typing import TypedDict
+from typing import TypedDict, NotRequired
 
 class AgentState(TypedDict):
     bank: str
@@ -14,3 +14,9 @@ class AgentState(TypedDict):
     csv_shape: tuple
     csv_sample: list
     pdf_sample: str
+    layout: NotRequired[dict | None]
+    samples: NotRequired[list]
+    reference: NotRequired[dict]
+    adopted_from: NotRequired[str]
+    candidates: NotRequired[int]
+    candidate_codes: NotRequired[list]
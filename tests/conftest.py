@@ -0,0 +1,50 @@
+import os
+import pytest
+from src import llm
+from utils.helpers import analyze_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ICICI_PDF = os.path.join(ROOT, "data/icici/icici_sample.pdf")
+ICICI_CSV = os.path.join(ROOT, "data/icici/result.csv")
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test from tmp_path, with the repository still importable."""
+    monkeypatch.syspath_prepend(ROOT)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def state_factory():
+    """Builds a fresh agent state for a sample pair (the ICICI sample by default)."""
+    def make(pdf_path=ICICI_PDF, csv_path=ICICI_CSV, bank="fake", **extra):
+        info = analyze_csv(csv_path)
+        return {
+            "bank": bank, "pdf_path": pdf_path, "csv_path": csv_path, "code": "", "iterations": 0,
+            "success": False, "error_msg": "", "feedback_msg": "", "csv_columns": info["columns"],
+            "csv_shape": info["shape"], "csv_sample": info["sample"], "pdf_sample": "", **extra,
+        }
+    return make
+
+@pytest.fixture
+def canned_code():
+    """Returns the code of a parser that just reads the expected CSV back."""
+    def make(csv_path=ICICI_CSV):
+        return f"def parse(pdf_path):\n    return pd.read_csv({str(csv_path)!r})\n"
+    return make
+
+@pytest.fixture
+def canned_llm(monkeypatch):
+    """
+    Replaces the LLM with `src.llm.FakeChat` cycling through `responses`, with
+    the response cache off; returns the list the prompts are recorded in.
+    """
+    def install(*responses):
+        prompts = []
+        fake = llm.FakeChat(list(responses))
+        invoke = fake.invoke
+        monkeypatch.setattr(llm, "CACHE_MODE", "off")
+        monkeypatch.setattr(llm, "get_llm", lambda *a: fake)
+        monkeypatch.setattr(fake, "invoke", lambda p: prompts.append(p) or invoke(p))
+        return prompts
+    return install
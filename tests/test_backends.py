@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+from custom_parsers.icici_parser import parse
+from utils.backends import compare_backends, open_pdf, words_to_text
+
+PDF_PATH = "data/icici/icici_sample.pdf"
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdfium2"])
+def test_fast_backend_parity(backend, monkeypatch):
+    assert compare_backends(PDF_PATH, "pdfplumber", backend) == []
+
+    expected = parse(PDF_PATH)
+    monkeypatch.setenv("PDF_BACKEND", backend)
+    pd.testing.assert_frame_equal(parse(PDF_PATH), expected)
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdfium2"])
+def test_crop_clips_words_straddling_the_edge(backend):
+    # x0=70 cuts through the dates and x1=300 through the debit amounts
+    bbox = (70, 112.5, 300, 792)
+
+    def cropped(name):
+        with open_pdf(PDF_PATH, name) as pdf:
+            words = pdf.pages[0].crop(bbox).extract_words()
+        return words_to_text(words), sorted((w["text"], round(w["x0"], 1), round(w["x1"], 1)) for w in words)
+
+    text, boxes = cropped("pdfplumber")
+    assert text.splitlines()[0] == "-2024 Salary Credit XYZ Pvt Ltd"
+    assert cropped(backend) == (text, boxes)
@@ -0,0 +1,45 @@
+import asyncio
+from src import llm, nodes
+from src.graph import build_graph
+
+BROKEN = "def parse(pdf_path):\n    raise ValueError('bad layout')\n"
+
+def test_first_passing_candidate_wins(workdir, state_factory, canned_code, canned_llm):
+    canned_llm(BROKEN, BROKEN, canned_code())
+
+    result = build_graph().invoke(state_factory(candidates=3))
+
+    assert result["success"] and result["iterations"] == 1
+    assert "pd.read_csv" in result["code"]
+    with open("custom_parsers/fake_parser.py") as f:
+        assert f.read() == result["code"]
+
+def test_runner_up_feedback_is_merged(workdir, state_factory):
+    empty = "def parse(pdf_path):\n    return pd.DataFrame()\n"
+    state = state_factory(candidate_codes=[nodes.clean_code(BROKEN), nodes.clean_code(empty)])
+    result = nodes.execute_test(state)
+
+    assert not result["success"]
+    assert result["feedback_msg"].startswith("Mismatch within the first 1 of 2 page(s)")
+    assert "Shape mismatch" in result["feedback_msg"]
+    assert "Candidate 1: ERROR DURING TEST" in result["feedback_msg"]
+
+def test_candidate_requests_reuse_one_event_loop(workdir, monkeypatch, state_factory, canned_code, canned_llm):
+    canned_llm(canned_code())
+    fake, loops = llm.get_llm(), []
+    ainvoke = fake.ainvoke
+
+    async def record(messages):
+        loops.append(asyncio.get_running_loop())
+        return await ainvoke(messages)
+    monkeypatch.setattr(fake, "ainvoke", record)
+
+    state = state_factory(candidates=2)
+    nodes.plan_generate(state)
+    nodes.plan_generate(state)
+    assert len(loops) == 4 and len(set(map(id, loops))) == 1 and not loops[0].is_closed()
+
+def test_clean_code_adds_only_the_imports_it_uses():
+    code = nodes.clean_code("```python\nimport re\ndef parse(pdf_path):\n    return pd.DataFrame(map_pages(pdf_path, f))\n```")
+    assert code.splitlines()[:3] == ["import pandas as pd", "from utils.parallel import map_pages", "import re"]
+    assert "pdfplumber" not in code and "numpy" not in code
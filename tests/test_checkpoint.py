@@ -0,0 +1,26 @@
+import pytest
+import agent
+from src import nodes
+from src.graph import build_graph
+from src.checkpoint import SqliteSaver
+
+def test_interrupted_run_resumes_without_new_llm_calls(workdir, monkeypatch, state_factory, canned_code, canned_llm):
+    prompts = canned_llm(canned_code())
+    state = state_factory()
+    saver = SqliteSaver(str(workdir / "checkpoints.sqlite"))
+    graph = build_graph(saver)
+
+    test_parser = nodes.test_parser
+    def crash(state):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(nodes, "test_parser", crash)
+    with pytest.raises(KeyboardInterrupt):
+        agent.invoke_bank(graph, saver, state)
+    monkeypatch.setattr(nodes, "test_parser", test_parser)
+
+    result = agent.invoke_bank(graph, saver, state, resume=True)
+    assert result["success"] and result["iterations"] == 1
+    assert len(prompts) == 1
+
+    runs = saver.runs("fake")
+    assert len(runs) == 1 and runs[0]["success"] and runs[0]["iterations"] == 1
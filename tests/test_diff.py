@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from utils.diff import diff_frames, format_diff
+
+def expected_df():
+    return pd.read_csv("data/icici/result.csv")
+
+def test_dropped_row_is_one_missing_row():
+    expected = expected_df()
+    parsed = expected.drop(index=57).reset_index(drop=True)
+    parsed.loc[0, ["Debit Amt", "Credit Amt"]] = [np.nan, 1935.3]
+
+    s = diff_frames(parsed, expected)
+
+    assert (s["matched"], s["changed"], s["missing"], s["extra"]) == (98, 1, 1, 0)
+    assert s["examples"]["missing"][0]["expected_row"] == 57
+    assert s["column_mismatches"] == {"Debit Amt": 1, "Credit Amt": 1}
+    assert format_diff(s).startswith("Shape mismatch: (99, 5) vs (100, 5)")
+
+def test_whitespace_and_nan_are_not_differences():
+    expected = expected_df()
+    parsed = expected.copy()
+    parsed["Description"] = " " + parsed["Description"] + "  "
+
+    s = diff_frames(parsed, expected)
+    assert s["matched"] == 100 and s["changed"] == s["missing"] == s["extra"] == 0
+
+def test_large_frames_with_reordering():
+    big = pd.concat([expected_df()] * 1000, ignore_index=True)
+    big["Description"] = big["Description"] + big.index.astype(str)
+    shuffled = big.iloc[::-1].reset_index(drop=True)
+
+    s = diff_frames(shuffled, big)
+    assert s["reordered"] == s["extra"] == s["missing"] == len(big) - 1
@@ -0,0 +1,37 @@
+import fitz
+from bench.synth import write_statement
+from custom_parsers.icici_parser import parse
+from utils import incremental
+
+def test_appended_pages_are_the_only_ones_parsed(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    short, _ = write_statement(str(tmp_path / "short"), pages=2, seed=3)
+    grown, _ = write_statement(str(tmp_path / "grown"), pages=4, seed=3)
+
+    _, stats = incremental.parse_incremental("icici", short, document="acct")
+    assert stats == {"pages": 2, "reused": 0, "parsed": 2}
+
+    df, stats = incremental.parse_incremental("icici", grown, document="acct")
+    assert stats == {"pages": 4, "reused": 2, "parsed": 2}
+    assert df.equals(parse(grown))
+
+    df, stats = incremental.parse_incremental("icici", grown, document="acct")
+    assert stats["parsed"] == 0 and df.equals(parse(grown))
+
+def _wrapped_statement(path, text):
+    # Draws the page's text inside a Form XObject, like PDFs assembled from
+    # other PDFs do: the page's own content stream only references the form.
+    src = fitz.open()
+    src.new_page().insert_text((72, 72), text)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.show_pdf_page(page.rect, src, 0)
+    doc.save(path)
+    return path
+
+def test_text_inside_form_xobjects_changes_the_page_hash(tmp_path):
+    a = _wrapped_statement(str(tmp_path / "a.pdf"), "01-08-2024 Salary 100.00")
+    b = _wrapped_statement(str(tmp_path / "b.pdf"), "01-08-2024 Refund 999.99")
+    assert incremental.page_hashes(a) != incremental.page_hashes(b)
+    assert incremental.page_hashes(a) == incremental.page_hashes(_wrapped_statement(str(tmp_path / "c.pdf"),
+                                                                                     "01-08-2024 Salary 100.00"))
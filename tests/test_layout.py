@@ -0,0 +1,19 @@
+import json
+from utils.backends import open_pdf
+from utils.layout import learn_layout, table_rows
+
+def test_learned_layout_matches_stored_fingerprint():
+    layout = learn_layout("data/icici/icici_sample.pdf", ["Date", "Description", "Debit Amt", "Credit Amt", "Balance"])
+    with open("custom_parsers/icici_layout.json") as f:
+        stored = json.load(f)
+    assert layout == stored
+    # Body starts below the header row (top ~90) and the title (top ~35)
+    assert 97 < layout["bbox"][1] < 103
+
+def test_table_rows_split_columns_by_position():
+    layout = learn_layout("data/icici/icici_sample.pdf", ["Date", "Description", "Debit Amt", "Credit Amt", "Balance"])
+    with open_pdf("data/icici/icici_sample.pdf") as pdf:
+        rows = table_rows(pdf.pages[0], layout)
+    assert len(rows) == 50
+    assert rows[0] == ["01-08-2024", "Salary Credit XYZ Pvt Ltd", "1935.3", "", "6864.58"]
+    assert rows[1] == ["02-08-2024", "Salary Credit XYZ Pvt Ltd", "", "1652.61", "8517.19"]
@@ -0,0 +1,35 @@
+import time
+import pytest
+from src import llm
+
+def test_cache_then_replay(tmp_path, monkeypatch):
+    fake = llm.FakeChat(["def parse(pdf_path): pass"])
+    monkeypatch.setattr(llm, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(llm, "get_llm", lambda *a: fake)
+
+    monkeypatch.setattr(llm, "CACHE_MODE", "on")
+    first = llm.complete("prompt A")
+    assert llm.complete("prompt A") == first
+    assert fake.calls == 1
+    assert llm.complete("prompt A", temperature=0.0) == first and fake.calls == 2
+
+    monkeypatch.setattr(llm, "CACHE_MODE", "replay")
+    start = time.perf_counter()
+    assert llm.complete("prompt A") == first
+    assert time.perf_counter() - start < 0.05
+    with pytest.raises(llm.ReplayMiss):
+        llm.complete("prompt B")
+    assert fake.calls == 2
+
+def test_key_covers_the_provider_and_fake_is_never_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(llm, "CACHE_MODE", "on")
+    keys = set()
+    for provider in ("gemini", "groq", "fake"):
+        monkeypatch.setattr(llm, "PROVIDER", provider)
+        keys.add(llm.cache_key("prompt A", model="m"))
+    assert len(keys) == 3
+
+    monkeypatch.setattr(llm, "get_llm", lambda *a: llm.FakeChat(["def parse(pdf_path): pass"]))
+    llm.complete("prompt A")
+    assert not any(tmp_path.iterdir())
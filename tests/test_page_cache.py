@@ -0,0 +1,31 @@
+import os
+import pdfplumber
+from utils import page_cache
+
+PDF_PATH = "data/icici/icici_sample.pdf"
+
+def test_page_cache_hits_match_pdfplumber(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path))
+
+    with pdfplumber.open(PDF_PATH) as pdf:
+        page = pdf.pages[1]
+        text, words = page_cache.page_text(page), page_cache.page_words(page)
+        assert text == page.extract_text()
+        assert words == page.extract_words()
+
+    with pdfplumber.open(PDF_PATH) as pdf:
+        page = pdf.pages[1]
+        page.extract_text = page.extract_words = None  # a hit must not touch pdfminer
+        assert page_cache.page_text(page) == text
+        assert page_cache.page_words(page) == words
+
+def test_page_cache_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path))
+
+    with pdfplumber.open(PDF_PATH) as pdf:
+        for page in pdf.pages:
+            page_cache.page_text(page)
+            page_cache.page_text(page, layout=True)
+
+    assert page_cache.evict(max_bytes=0) == 4
+    assert not any(files for _, _, files in os.walk(tmp_path))
@@ -0,0 +1,17 @@
+import pandas as pd
+from custom_parsers.icici_parser import parse
+from utils.parallel import page_ranges
+
+def test_page_ranges_cover_all_pages():
+    for n_pages in (1, 2, 7, 100, 1001):
+        ranges = page_ranges(n_pages, workers=3)
+        assert ranges[0][0] == 0 and ranges[-1][1] == n_pages
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+def test_parallel_parse_matches_serial():
+    pdf_path = "data/icici/icici_sample.pdf"
+
+    serial_df = parse(pdf_path)
+    parallel_df = parse(pdf_path, workers=2)
+
+    pd.testing.assert_frame_equal(serial_df, parallel_df)
@@ -0,0 +1,66 @@
+import os, shutil
+import pytest
+from bench.synth import write_statement
+from src.graph import build_graph
+from utils import trace
+from utils.layout import ensure_layout, save_layout
+from custom_parsers import icici_parser
+
+EMPTY = "import pandas as pd\ndef parse(pdf_path):\n    return pd.DataFrame()\n"
+
+@pytest.fixture
+def synthetic_state(tmp_path, workdir, state_factory):
+    """State for a new bank with a synthetic statement and its learned layout."""
+    pdf_path, csv_path = write_statement(str(tmp_path / "data"), pages=2, seed=5)
+    state = state_factory(pdf_path, csv_path, bank="newbank")
+    state["layout"] = ensure_layout("newbank", pdf_path, state["csv_columns"])
+    return state
+
+def _existing_parser(name, code=EMPTY):
+    os.makedirs("custom_parsers", exist_ok=True)
+    with open(f"custom_parsers/{name}_parser.py", "w") as f:
+        f.write(code)
+
+def test_matching_parser_is_adopted_without_llm_calls(synthetic_state, canned_llm):
+    source_dir = os.path.dirname(icici_parser.__file__)
+    for name in ("icici_parser.py", "icici_layout.json"):
+        shutil.copy(os.path.join(source_dir, name), "custom_parsers")
+    _existing_parser("other")
+    prompts = canned_llm(EMPTY)
+
+    with trace.run("agent") as t:
+        result = build_graph().invoke(synthetic_state)
+
+    assert result["success"] and result["iterations"] == 0 and result["adopted_from"] == "icici"
+    tried = {s["attrs"]["bank"]: s["attrs"]["passed"] for s in t.spans if s["name"] == "preflight.candidate"}
+    assert tried == {"icici": True}  # "other" has no layout to compare with
+    assert prompts == []
+    with open("custom_parsers/newbank_parser.py") as f:
+        assert f.read() == result["code"]
+    # The adopted copy reads the new bank's layout, not the one it came from
+    assert "load_layout('newbank')" in result["code"] and "load_layout('icici')" not in result["code"]
+
+def test_closest_parser_seeds_the_first_prompt(synthetic_state, canned_code, canned_llm):
+    _existing_parser("other")
+    save_layout("other", synthetic_state["layout"])
+    prompts = canned_llm(canned_code(synthetic_state["csv_path"]))
+
+    result = build_graph().invoke(synthetic_state)
+
+    assert result["success"] and result["iterations"] == 1 and len(prompts) == 1
+    assert "Closest existing parser (other, layout similarity 1.00)" in prompts[0][0][1]
+    assert "Shape mismatch" in prompts[0][0][1]
+
+@pytest.mark.parametrize("sample_layout", [True, False])
+def test_dissimilar_or_unknown_layouts_skip_preflight(synthetic_state, canned_code, canned_llm, sample_layout):
+    _existing_parser("other")  # no layout: similarity 0
+    prompts = canned_llm(canned_code(synthetic_state["csv_path"]))
+    if not sample_layout:
+        synthetic_state["layout"] = None
+
+    with trace.run("agent") as t:
+        result = build_graph().invoke(synthetic_state)
+
+    assert result["success"] and "reference" not in result
+    assert "preflight.candidate" not in t.summary()
+    assert "Closest existing parser" not in prompts[0][0][1]
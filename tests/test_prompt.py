@@ -0,0 +1,44 @@
+from utils.prompt import build_prompt, compress_traceback, count_tokens
+
+TRACEBACK = """ERROR DURING TEST: Unable to parse string "Dr" at position 0
+Traceback (most recent call last):
+  File "/app/utils/helpers.py", line 240, in run_test
+    return compare_stream(parser_module.parse_iter(state["pdf_path"]), df_exp)
+  File "custom_parsers/icici_parser.py", line 21, in to_frame
+    amount = pd.to_numeric(df["Amount"])
+             ^^^^^^^^^^^^^^^^^^^^^^^^^^^
+  File "/site-packages/pandas/core/tools/numeric.py", line 235, in to_numeric
+    values, new_mask = lib.maybe_convert_numeric(
+ValueError: Unable to parse string "Dr" at position 0"""
+
+STATE = {
+    "csv_columns": ["Date", "Description", "Debit Amt", "Credit Amt", "Balance"], "csv_shape": (100, 5),
+    "csv_sample": [{"Date": "01-08-2024", "Description": "Salary", "Debit Amt": 1.0, "Credit Amt": None, "Balance": 2.0}],
+    "pdf_sample": "01-08-2024 Salary 1.0 2.0",
+}
+
+def test_traceback_keeps_generated_frames():
+    out = compress_traceback(TRACEBACK)
+    assert 'File "custom_parsers/icici_parser.py", line 21' in out
+    assert "helpers.py" not in out and "numeric.py" not in out and "^^^" not in out
+    assert out.endswith('ValueError: Unable to parse string "Dr" at position 0')
+
+def test_prompt_respects_budget():
+    diff = "Rows: 10 match, 90 changed, 0 missing, 0 extra\nChanged rows (parsed vs expected):\n" + "\n".join(
+        f"  parsed row {i} / expected row {i}: Debit Amt: nan vs {i}.5; Credit Amt: {i}.5 vs nan" for i in range(2000))
+    prompt, stats = build_prompt({**STATE, "feedback_msg": diff}, budget=1500)
+    assert stats["tokens"] <= 1500 and stats["feedback_tokens"] > 1500
+    assert "Rows: 10 match, 90 changed" in prompt and "more lines omitted" in prompt
+    assert count_tokens(prompt) == stats["tokens"]
+
+def test_prompt_never_exceeds_budget_with_oversized_sections():
+    state = {
+        **STATE, "feedback_msg": TRACEBACK + "\n" + "\n".join(f"  detail line {i}" for i in range(500)),
+        "pdf_sample": "\n".join(f"01-08-2024 Payment number {i} 1.0 2.0" for i in range(2000)),
+        "csv_sample": STATE["csv_sample"] * 200,
+        "reference": {"bank": "icici", "similarity": 0.9, "code": "\n".join(f"x_{i} = {i}" for i in range(2000))},
+    }
+    fixed = build_prompt({**STATE, "feedback_msg": "", "pdf_sample": "", "csv_sample": []}, budget=10 ** 6)[1]["tokens"]
+    for budget in range(fixed, fixed + 600, 23):
+        prompt, stats = build_prompt(state, budget=budget)
+        assert count_tokens(prompt) == stats["tokens"] <= budget
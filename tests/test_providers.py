@@ -0,0 +1,21 @@
+import os, sys, subprocess
+import pytest
+from src import llm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SDKS = ["langchain_cerebras", "langchain_google_genai", "langchain_groq", "langchain_openai", "langchain_together", "keys"]
+
+def test_agent_startup_imports_no_provider_sdk():
+    code = ("import sys, agent\nfrom src import llm\nllm.get_llm()\n"
+            f"print([m for m in {SDKS!r} if m in sys.modules])")
+    env = {**os.environ, "LLM_PROVIDER": "fake"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+def test_default_model_follows_provider(monkeypatch):
+    monkeypatch.setattr(llm, "MODEL", "")
+    monkeypatch.setattr(llm, "PROVIDER", "groq")
+    assert llm.default_model() == "llama-3.3-70b-versatile"
+    monkeypatch.setattr(llm, "PROVIDER", "nope")
+    with pytest.raises(ValueError):
+        llm.default_model()
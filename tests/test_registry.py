@@ -0,0 +1,34 @@
+import os
+import pytest
+from utils import registry, helpers, sandbox
+
+STATE = {"bank": "icici", "pdf_path": "data/icici/icici_sample.pdf", "csv_path": "data/icici/result.csv"}
+
+def test_module_reloads_only_when_content_changes(tmp_path):
+    path = tmp_path / "demo_parser.py"
+    path.write_text("VALUE = 1\n")
+    first = registry.load_module("demo_parser", str(path))
+    assert registry.load_module("demo_parser", str(path)) is first
+
+    path.write_text("VALUE = 2\n")
+    second = registry.load_module("demo_parser", str(path))
+    assert second is not first and second.VALUE == 2
+
+@pytest.mark.parametrize("verdict", [(True, "ALL MATCH"), (False, "Shape mismatch")])
+def test_identical_code_reuses_verdict(monkeypatch, verdict):
+    monkeypatch.setattr(sandbox, "ENABLED", False)
+    monkeypatch.setattr(registry, "_verdicts", {})
+    calls = []
+    monkeypatch.setattr(helpers, "run_test", lambda state: calls.append(state) or verdict)
+    state = {**STATE, "parser_path": "custom_parsers/icici_parser.py"}
+    assert helpers.test_parser(state) == verdict
+    assert helpers.test_parser(dict(state)) == verdict
+    assert helpers.test_samples(state, [(STATE["pdf_path"], STATE["csv_path"])])[0] == verdict[0]
+    assert len(calls) == 1
+
+def test_write_parser_skips_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "PARSER_DIR", str(tmp_path))
+    assert registry.write_parser("demo", "X = 1\n")
+    mtime = os.stat(registry.parser_path("demo")).st_mtime_ns
+    assert not registry.write_parser("demo", "X = 1\n")
+    assert os.stat(registry.parser_path("demo")).st_mtime_ns == mtime
@@ -0,0 +1,31 @@
+import time
+import pandas as pd
+from bench.synth import write_statement
+from utils import helpers, registry, sandbox
+
+def test_parser_is_checked_against_every_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "_verdicts", {})
+    samples = [list(write_statement(str(tmp_path / f"s{seed}"), pages=2, seed=seed)) for seed in range(3)]
+    broken = pd.read_csv(samples[2][1])
+    broken.loc[60, "Balance"] += 1
+    broken.to_csv(samples[2][1], index=False)
+
+    state = {"bank": "icici", "pdf_path": samples[0][0], "csv_path": samples[0][1], "samples": samples}
+    ok, feedback = helpers.test_parser(state)
+
+    assert not ok
+    lines = feedback.splitlines()
+    assert lines[0].startswith("Samples: 2/3 passed")
+    assert [l.split()[0] for l in lines[1:4]] == ["PASS", "PASS", "FAIL"]
+    assert f"Feedback for {samples[2][0]}:" in feedback and "Mismatch in rows 49-98" in feedback
+
+def test_samples_run_concurrently_without_the_sandbox(monkeypatch):
+    monkeypatch.setattr(sandbox, "ENABLED", False)
+    monkeypatch.setattr(registry, "_verdicts", {})
+    monkeypatch.setattr(helpers, "run_test", lambda state: time.sleep(0.5) or (True, "ALL MATCH"))
+    samples = [("data/icici/icici_sample.pdf", "data/icici/result.csv")] * 3
+    state = {"bank": "icici", "parser_path": "custom_parsers/icici_parser.py"}
+
+    start = time.perf_counter()
+    ok, feedback = helpers.test_samples(state, samples)
+    assert ok and time.perf_counter() - start < 1.2
@@ -0,0 +1,69 @@
+import os, time
+import pandas as pd
+from utils.sandbox import SandboxPool, cancel_scope, run_parser
+
+def spin():
+    while True:
+        pass
+
+def grab_memory():
+    return len(bytearray(8 * 1024 ** 3))
+
+class Planted:
+    # Unpickling this would create the file in the process that unpickles it
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, "w")
+
+def plant(path):
+    return Planted(path)
+
+def test_run_parser_returns_dataframe():
+    ok, df = run_parser("custom_parsers/icici_parser.py", "data/icici/icici_sample.pdf")
+    assert ok and isinstance(df, pd.DataFrame) and len(df) == 100
+
+def test_pool_survives_hostile_code():
+    pool = SandboxPool(workers=1, timeout=2, cpu_seconds=30, memory_mb=2048)
+    try:
+        start = time.perf_counter()
+        ok, err = pool.call(spin)
+        assert not ok and err["type"] == "Timeout"
+        assert time.perf_counter() - start < 10
+
+        ok, err = pool.call(grab_memory)
+        assert not ok and err["type"] == "MemoryError"
+
+        ok, value = pool.call(sum, [1, 2, 3])
+        assert ok and value == 6
+    finally:
+        pool.close()
+
+def test_results_are_not_unpickled_in_the_caller(tmp_path):
+    pool = SandboxPool(workers=1, timeout=30)
+    try:
+        ok, err = pool.call(plant, str(tmp_path / "planted"))
+        assert not ok and err["type"] == "SerializationError"
+        assert not os.path.exists(tmp_path / "planted")
+
+        ok, value = pool.call(divmod, 7, 2)
+        assert ok and value == (3, 1)
+    finally:
+        pool.close()
+
+def test_cancelled_calls_stop_and_free_their_workers():
+    pool = SandboxPool(workers=2, timeout=60)
+    try:
+        with cancel_scope() as scope:
+            futures = [pool.submit(spin) for _ in range(2)]
+            time.sleep(0.5)
+            start = time.perf_counter()
+            scope.cancel()
+            results = [f.result() for f in futures]
+        assert time.perf_counter() - start < 10
+        assert [(ok, err["type"]) for ok, err in results] == [(False, "Cancelled")] * 2
+
+        assert pool.call(sum, [1, 2, 3]) == (True, 6)
+    finally:
+        pool.close()
@@ -0,0 +1,62 @@
+import fitz
+import pandas as pd
+from custom_parsers.icici_parser import parse, parse_iter
+from utils.helpers import compare_stream, normalize_frame
+from utils.stream import write_csv, write_parquet
+
+PDF_PATH = "data/icici/icici_sample.pdf"
+
+def test_parse_iter_matches_parse():
+    chunks = list(parse_iter(PDF_PATH))
+    assert [len(c) for c in chunks] == [49, 50, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), parse(PDF_PATH))
+    assert len(list(parse_iter(PDF_PATH, rows=True))) == 100
+
+def test_sinks_round_trip(tmp_path):
+    csv_path, parquet_path = tmp_path / "out.csv", tmp_path / "out.parquet"
+
+    assert write_csv(parse_iter(PDF_PATH), csv_path) == 100
+    assert write_parquet(parse_iter(PDF_PATH), parquet_path) == 100
+
+    expected = parse(PDF_PATH)
+    pd.testing.assert_frame_equal(pd.read_parquet(parquet_path), expected)
+    assert pd.read_csv(csv_path).shape == expected.shape
+
+def test_compare_stream_stops_at_first_mismatch():
+    expected = normalize_frame(parse(PDF_PATH))
+    expected.loc[3, "Balance"] = -1.0
+    seen = []
+
+    def chunks():
+        for chunk in parse_iter(PDF_PATH):
+            seen.append(len(chunk))
+            yield chunk
+
+    ok, feedback = compare_stream(chunks(), expected)
+    assert not ok and feedback.startswith("Mismatch in rows 0-48")
+    assert seen == [49]  # the page's last transaction is held back for the next page
+
+def test_description_wrapping_across_pages(tmp_path):
+    # ICICI layout cells (see custom_parsers/icici_layout.json); page 2 opens
+    # with the rest of page 1's last description
+    pages = [
+        [("01-08-2024", "Salary Credit", "", "100.00", "100.00"),
+         ("02-08-2024", "NEFT Transfer To", "50.00", "", "50.00")],
+        [("", "ABC Ltd", "", "", ""),
+         ("03-08-2024", "Interest Credit", "", "1.00", "51.00")],
+    ]
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page(width=612, height=792)
+        for i, cells in enumerate(lines):
+            for x, text in zip([40, 120, 280, 380, 500], cells):
+                if text:
+                    page.insert_text((x, 120 + i * 13.1), text, fontsize=7)
+    pdf_path = str(tmp_path / "wrapped.pdf")
+    doc.save(pdf_path)
+
+    expected = parse(pdf_path)
+    assert expected["Description"].tolist() == ["Salary Credit", "NEFT Transfer To ABC Ltd", "Interest Credit"]
+    chunks = list(parse_iter(pdf_path))
+    assert [len(c) for c in chunks] == [1, 1, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
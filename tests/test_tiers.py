@@ -0,0 +1,46 @@
+import os
+from bench.synth import write_statement
+from utils import helpers, page_cache
+
+SHIFTED = (
+    "from custom_parsers.icici_parser import parse as icici_parse\n"
+    "def parse(pdf_path, workers=1):\n"
+    "    df = icici_parse(pdf_path)\n"
+    "    df['Balance'] = df['Balance'] + 1\n"
+    "    return df\n"
+)
+
+TRUNCATED = (
+    "from custom_parsers.icici_parser import parse_iter, parse as icici_parse\n"
+    "def parse(pdf_path, workers=1):\n"
+    "    return icici_parse(pdf_path).iloc[:60]\n"
+)
+
+def _state(tmp_path, code):
+    pdf_path, csv_path = write_statement(str(tmp_path), pages=12)
+    parser = tmp_path / "shifted_parser.py"
+    parser.write_text(code)
+    return {"bank": "shifted", "pdf_path": pdf_path, "csv_path": csv_path, "parser_path": str(parser)}
+
+def test_wrong_parser_fails_on_first_page(tmp_path):
+    ok, feedback = helpers.run_test(_state(tmp_path, SHIFTED))
+    assert not ok
+    assert feedback.startswith("Mismatch within the first 1 of 12 page(s)")
+    assert "Rows: 0 match, 49 changed" in feedback
+
+def test_correct_parser_passes_every_tier(tmp_path):
+    ok, feedback = helpers.run_test(_state(tmp_path, "from custom_parsers.icici_parser import parse\n"))
+    assert ok, feedback
+
+def test_parse_is_checked_even_when_parse_iter_matches(tmp_path):
+    ok, feedback = helpers.run_test(_state(tmp_path, TRUNCATED))
+    assert not ok
+    assert feedback.startswith("parse_iter matches, but parse does not")
+
+def test_tiers_reuse_the_page_cache_of_the_original_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path / "pages"))
+    state = _state(tmp_path, "from custom_parsers.icici_parser import parse_page, to_frame, parse\n")
+    ok, feedback = helpers.run_test(state)
+    assert ok, feedback
+    # One entry per page of the 12-page statement: the tiers parsed the same pages, not prefix copies
+    assert sum(len(files) for _, _, files in os.walk(tmp_path / "pages")) == 12
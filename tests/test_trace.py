@@ -0,0 +1,33 @@
+import json
+from utils import trace
+
+def test_spans_merge_and_export(tmp_path):
+    @trace.timed("helper.work")
+    def work(x):
+        return x * 2
+
+    with trace.run("agent", bank="demo") as t:
+        assert work(2) == 4
+        with trace.span("llm.complete") as attrs:
+            attrs.update(prompt_tokens=10, response_tokens=5, retries=1, cached=False)
+        result, spans = trace.collect(work, 3)
+        trace.merge(spans, 0.0)
+    assert trace.current() is None and result == 6
+
+    summary = t.summary()
+    assert summary["helper.work"]["count"] == 2 and summary["llm.complete"]["count"] == 1
+    assert t.llm_totals() == {"calls": 1, "cached": 0, "retries": 1, "prompt_tokens": 10, "response_tokens": 5}
+
+    with open(t.export(str(tmp_path))) as f:
+        assert json.load(f)["summary"]["helper.work"]["count"] == 2
+
+    prom = tmp_path / "agent.prom"
+    trace.write_prometheus([t], str(prom))
+    text = prom.read_text()
+    assert 'agent_span_seconds_count{bank="demo",span="helper.work"} 2' in text
+    assert 'agent_llm_total{bank="demo",kind="prompt_tokens"} 10' in text
+
+def test_spans_are_noops_without_trace():
+    with trace.span("x") as attrs:
+        attrs["y"] = 1
+    assert trace.current() is None
@@ -0,0 +1,302 @@
+"""
+Pluggable PDF text backends
+
+Every extraction path (parsers, helpers, the page cache) opens PDFs through
+`open_pdf`, which returns a pdfplumber-compatible document for the selected
+backend:
+
+- "pdfplumber": pdfplumber itself (default; full pdfplumber page API)
+- "pymupdf":    PyMuPDF, several times faster
+- "pypdfium2":  pypdfium2, also much faster than pdfplumber
+
+Pages from the fast backends support `extract_text()`, `extract_words()`,
+`crop(bbox)`, `page_number`, `width`, `height` and `close()`; their text is rebuilt from
+word boxes line by line the way pdfplumber does it, so parsers that only use
+`page_text`/`page_words` run unchanged on any backend.
+
+The backend is chosen per run with the PDF_BACKEND environment variable (or
+`agent.py --pdf-backend`), which also reaches worker processes. Before
+switching a bank to a fast backend, check parity:
+
+    python -m utils.backends data/icici/icici_sample.pdf --backends pdfplumber pymupdf
+"""
+
+import os, sys, difflib, argparse
+
+BACKENDS = ["pdfplumber", "pymupdf", "pypdfium2"]
+LINE_TOLERANCE = 3.0
+
+
+def get_backend() -> str:
+    """
+    Returns the backend selected for this run (PDF_BACKEND, default pdfplumber).
+    """
+    name = os.getenv("PDF_BACKEND", "pdfplumber")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF_BACKEND {name!r}; expected one of {BACKENDS}")
+    return name
+
+def words_to_text(words: list[dict]) -> str:
+    """
+    Joins word boxes into text lines, like pdfplumber's default extract_text.
+
+    Words whose tops are within LINE_TOLERANCE points share a line; each line
+    is ordered left to right and joined with single spaces.
+    """
+    lines, current, line_top = [], [], None
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if line_top is not None and w["top"] - line_top > LINE_TOLERANCE:
+            lines.append(current)
+            current = []
+        if not current:
+            line_top = w["top"]
+        current.append(w)
+    if current:
+        lines.append(current)
+    return "\n".join(" ".join(w["text"] for w in sorted(line, key=lambda w: w["x0"])) for line in lines)
+
+
+class _Page:
+    """Backend-neutral page exposing the subset of pdfplumber's Page API we use."""
+
+    def __init__(self, pdf, index: int):
+        self.pdf = pdf
+        self.page_number = index + 1
+        self._words = None
+
+    def _boxes(self) -> list[dict]:
+        # word boxes, each with the (x0, x1) extent of every one of its chars
+        if self._words is None:
+            self._words = self.pdf._words(self.page_number - 1)
+        return self._words
+
+    def extract_words(self, **kwargs) -> list[dict]:
+        return [{k: v for k, v in w.items() if k != "chars"} for w in self._boxes()]
+
+    def extract_text(self, **kwargs) -> str:
+        return words_to_text(self.extract_words())
+
+    def crop(self, bbox: tuple) -> "_CroppedPage":
+        return _CroppedPage(self, bbox)
+
+    def close(self) -> None:
+        self._words = None
+
+
+class _CroppedPage:
+    """
+    Region of a `_Page`, cropped the way pdfplumber's `Page.crop` does it.
+
+    pdfplumber keeps every char that touches `bbox` and clips its box to it,
+    so a word straddling the edge keeps only its chars on the inside, with
+    its box clipped to the region.
+    """
+
+    def __init__(self, page: _Page, bbox: tuple):
+        self.page, self.bbox = page, bbox
+        self.pdf, self.page_number = page.pdf, page.page_number
+        self.width, self.height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+    def extract_words(self, **kwargs) -> list[dict]:
+        x0, top, x1, bottom = self.bbox
+        words = []
+        for w in self.page._boxes():
+            height = min(bottom, w["bottom"]) - max(top, w["top"])
+            if height < 0:
+                continue
+            kept = [(i, max(x0, cx0), min(x1, cx1)) for i, (cx0, cx1) in enumerate(w["chars"])
+                    if min(x1, cx1) - max(x0, cx0) >= 0 and min(x1, cx1) - max(x0, cx0) + height > 0]
+            if kept:
+                words.append({"text": w["text"][kept[0][0]:kept[-1][0] + 1],
+                              "x0": min(k[1] for k in kept), "x1": max(k[2] for k in kept),
+                              "top": max(top, w["top"]), "bottom": min(bottom, w["bottom"])})
+        return words
+
+    def extract_text(self, **kwargs) -> str:
+        return words_to_text(self.extract_words())
+
+
+class _Document:
+    backend = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = [_Page(self, i) for i in range(self._page_count())]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PyMuPDFDocument(_Document):
+    backend = "pymupdf"
+
+    def __init__(self, path: str):
+        import fitz
+        self._doc = fitz.open(path)
+        super().__init__(path)
+        for page in self.pages:
+            rect = self._doc[page.page_number - 1].rect
+            page.width, page.height = rect.width, rect.height
+
+    def _page_count(self) -> int:
+        return len(self._doc)
+
+    def _words(self, index: int) -> list[dict]:
+        # rebuilt from the char boxes; splits exactly like get_text("words")
+        words, text, box, chars = [], "", None, []
+        for block in self._doc[index].get_text("rawdict")["blocks"]:
+            for line in block.get("lines", []):
+                for char in (c for span in line["spans"] for c in span["chars"]):
+                    if not char["c"].strip():
+                        if text:
+                            words.append({"text": text, "x0": box[0], "x1": box[2],
+                                          "top": box[1], "bottom": box[3], "chars": chars})
+                        text, box, chars = "", None, []
+                        continue
+                    left, top, right, bottom = char["bbox"]
+                    if box is None:
+                        box = [left, top, right, bottom]
+                    else:
+                        box = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+                    text += char["c"]
+                    chars.append((left, right))
+                if text:
+                    words.append({"text": text, "x0": box[0], "x1": box[2],
+                                  "top": box[1], "bottom": box[3], "chars": chars})
+                text, box, chars = "", None, []
+        return words
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+class _PdfiumDocument(_Document):
+    backend = "pypdfium2"
+
+    def __init__(self, path: str):
+        import pypdfium2
+        self._doc = pypdfium2.PdfDocument(path)
+        super().__init__(path)
+        for page in self.pages:
+            page.width, page.height = self._doc.get_page_size(page.page_number - 1)
+
+    def _page_count(self) -> int:
+        return len(self._doc)
+
+    def _words(self, index: int) -> list[dict]:
+        page = self._doc[index]
+        height = page.get_height()
+        textpage = page.get_textpage()
+        words, text, box, chars = [], "", None, []
+        try:
+            for i in range(textpage.count_chars()):
+                ch = textpage.get_text_range(i, 1)
+                if not ch.strip():
+                    if text:
+                        words.append({"text": text, "x0": box[0], "x1": box[2],
+                                      "top": height - box[3], "bottom": height - box[1], "chars": chars})
+                    text, box, chars = "", None, []
+                    continue
+                left, bottom, right, top = textpage.get_charbox(i, loose=True)
+                if box is None:
+                    box = [left, bottom, right, top]
+                else:
+                    box = [min(box[0], left), min(box[1], bottom), max(box[2], right), max(box[3], top)]
+                text += ch
+                chars.append((left, right))
+            if text:
+                words.append({"text": text, "x0": box[0], "x1": box[2],
+                              "top": height - box[3], "bottom": height - box[1], "chars": chars})
+        finally:
+            textpage.close()
+            page.close()
+        return words
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+def open_pdf(pdf_path: str, backend: str | None = None):
+    """
+    Opens a PDF with the selected backend.
+
+    Args:
+        pdf_path (str): File system path to the PDF file
+        backend (str | None): Backend name; defaults to `get_backend()`
+
+    Returns:
+        A context-manageable document with a `.pages` list. For "pdfplumber"
+        this is a pdfplumber.PDF.
+
+    Example:
+        >>> with open_pdf("data/icici/icici_sample.pdf", "pymupdf") as pdf:
+        ...     print(pdf.pages[0].extract_text().splitlines()[1])
+        Date Description Debit Amt Credit Amt Balance
+    """
+    backend = backend or get_backend()
+    if backend == "pdfplumber":
+        import pdfplumber
+        pdf = pdfplumber.open(pdf_path)
+        pdf.backend = "pdfplumber"
+        return pdf
+    if backend == "pymupdf":
+        return _PyMuPDFDocument(pdf_path)
+    if backend == "pypdfium2":
+        return _PdfiumDocument(pdf_path)
+    raise ValueError(f"Unknown PDF backend {backend!r}; expected one of {BACKENDS}")
+
+def compare_backends(pdf_path: str, a: str = "pdfplumber", b: str = "pymupdf") -> list[dict]:
+    """
+    Extracts every page with two backends and reports line-level differences.
+
+    Args:
+        pdf_path (str): File system path to the PDF file
+        a (str): Reference backend
+        b (str): Candidate backend
+
+    Returns:
+        list: One dict per differing line range with "page", a-side lines
+              and b-side lines; empty when the backends agree exactly
+
+    Example:
+        >>> compare_backends("data/icici/icici_sample.pdf", "pdfplumber", "pypdfium2")
+        []
+    """
+    diffs = []
+    with open_pdf(pdf_path, a) as pdf_a, open_pdf(pdf_path, b) as pdf_b:
+        if len(pdf_a.pages) != len(pdf_b.pages):
+            return [{"page": None, a: [f"{len(pdf_a.pages)} pages"], b: [f"{len(pdf_b.pages)} pages"]}]
+        for page_a, page_b in zip(pdf_a.pages, pdf_b.pages):
+            lines_a = (page_a.extract_text() or "").splitlines()
+            lines_b = (page_b.extract_text() or "").splitlines()
+            matcher = difflib.SequenceMatcher(None, lines_a, lines_b, autojunk=False)
+            for op, i1, i2, j1, j2 in matcher.get_opcodes():
+                if op != "equal":
+                    diffs.append({"page": page_a.page_number, a: lines_a[i1:i2], b: lines_b[j1:j2]})
+    return diffs
+
+def main():
+    p = argparse.ArgumentParser(description="Check text parity between two PDF backends.")
+    p.add_argument("pdf", nargs="+", help="PDF file(s) to compare")
+    p.add_argument("--backends", nargs=2, default=["pdfplumber", "pymupdf"], choices=BACKENDS)
+    args = p.parse_args()
+
+    a, b = args.backends
+    total = 0
+    for pdf in args.pdf:
+        diffs = compare_backends(pdf, a, b)
+        total += len(diffs)
+        print(f"{pdf}: {'parity OK' if not diffs else f'{len(diffs)} differing line range(s)'}")
+        for d in diffs[:20]:
+            print(f"  page {d['page']}:")
+            for line in d[a]:
+                print(f"    - {a}: {line}")
+            for line in d[b]:
+                print(f"    + {b}: {line}")
+    sys.exit(1 if total else 0)
+
+if __name__ == "__main__":
+    main()
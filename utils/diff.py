@@ -0,0 +1,223 @@
+"""
+Hash-aligned DataFrame diff engine
+
+Compares a parsed DataFrame with the expected one in three steps:
+
+1. Every row is hashed once (`pd.util.hash_pandas_object`) over the shared
+   columns, with string columns stripped.
+2. The two hash sequences are aligned patience-diff style: common prefixes
+   and suffixes are trimmed with NumPy, rows whose hash is unique on both
+   sides become anchors (longest increasing subsequence), and the gaps
+   between anchors are aligned recursively. Leftover rows in a gap are paired
+   positionally as "changed"; the rest are "missing" or "extra".
+3. Changed pairs are compared column by column, vectorized.
+
+Unlike `DataFrame.compare`, this works when shapes differ (a dropped or
+duplicated row shows up as one missing/extra row instead of every later row
+being wrong) and stays near-linear on 100k-row frames.
+"""
+
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+
+
+def row_hashes(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """
+    Returns one uint64 hash per row over `columns`, stripping string values.
+    """
+    norm = df[columns].copy()
+    for col in norm.select_dtypes(include=["object"]).columns:
+        norm[col] = norm[col].astype(str).str.strip()
+    return pd.util.hash_pandas_object(norm, index=False).to_numpy()
+
+def _common_prefix(a: np.ndarray, b: np.ndarray) -> int:
+    n = min(len(a), len(b))
+    diff = np.flatnonzero(a[:n] != b[:n])
+    return int(diff[0]) if len(diff) else n
+
+def _anchors(a: np.ndarray, b: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Returns (i, j) pairs of hashes unique in both sequences, filtered to the
+    longest run that is increasing in both positions.
+    """
+    ua, ia, ca = np.unique(a, return_index=True, return_counts=True)
+    ub, ib, cb = np.unique(b, return_index=True, return_counts=True)
+    common, pa, pb = np.intersect1d(ua[ca == 1], ub[cb == 1], assume_unique=True, return_indices=True)
+    if not len(common):
+        return []
+    i_pos = ia[ca == 1][pa]
+    j_pos = ib[cb == 1][pb]
+    order = np.argsort(i_pos)
+    i_pos, j_pos = i_pos[order], j_pos[order]
+
+    # Longest increasing subsequence of j positions (patience sorting).
+    tails, tail_idx, prev = [], [], [-1] * len(j_pos)
+    for k, j in enumerate(j_pos):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos else -1
+    out, k = [], tail_idx[-1]
+    while k != -1:
+        out.append((int(i_pos[k]), int(j_pos[k])))
+        k = prev[k]
+    return out[::-1]
+
+def align(a: np.ndarray, b: np.ndarray) -> tuple[int, list, list, list]:
+    """
+    Aligns two hash sequences.
+
+    Args:
+        a: Row hashes of the parsed frame
+        b: Row hashes of the expected frame
+
+    Returns:
+        tuple: (matched count, changed (i, j) pairs, extra i positions,
+                missing j positions)
+    """
+    matched, changed, extra, missing = 0, [], [], []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        i0, i1, j0, j1 = stack.pop()
+        n = _common_prefix(a[i0:i1], b[j0:j1])
+        matched += n
+        i0, j0 = i0 + n, j0 + n
+        n = _common_prefix(a[i0:i1][::-1], b[j0:j1][::-1])
+        matched += n
+        i1, j1 = i1 - n, j1 - n
+        if i0 == i1 or j0 == j1:
+            extra.extend(range(i0, i1))
+            missing.extend(range(j0, j1))
+            continue
+
+        anchors = _anchors(a[i0:i1], b[j0:j1])
+        if anchors:
+            matched += len(anchors)
+            pi, pj = i0, j0
+            for ai, aj in anchors:
+                if pi < i0 + ai or pj < j0 + aj:
+                    stack.append((pi, i0 + ai, pj, j0 + aj))
+                pi, pj = i0 + ai + 1, j0 + aj + 1
+            stack.append((pi, i1, pj, j1))
+            continue
+
+        n = min(i1 - i0, j1 - j0)
+        for k in range(n):
+            if a[i0 + k] == b[j0 + k]:
+                matched += 1
+            else:
+                changed.append((i0 + k, j0 + k))
+        extra.extend(range(i0 + n, i1))
+        missing.extend(range(j0 + n, j1))
+    return matched, sorted(changed), sorted(extra), sorted(missing)
+
+def _py(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def _values_equal(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    eq = np.asarray(x == y, dtype=bool)
+    return eq | (pd.isna(x) & pd.isna(y))
+
+def diff_frames(parsed: pd.DataFrame, expected: pd.DataFrame, max_rows: int = 10) -> dict:
+    """
+    Diffs a parsed DataFrame against the expected one.
+
+    Args:
+        parsed: DataFrame produced by the parser
+        expected: Reference DataFrame (result.csv)
+        max_rows (int): Number of example rows kept per category
+
+    Returns:
+        dict: Compact structured summary with keys "shape", "columns",
+              "dtypes", "matched", "changed", "missing", "extra", "reordered"
+              (counts; reordered extra rows also exist among the missing ones),
+              "column_mismatches" ({column: count over changed rows}) and
+              "examples" (the first `max_rows` changed/missing/extra rows
+              with their positions and values)
+
+    Example:
+        >>> s = diff_frames(parsed, expected)
+        >>> s["matched"], s["missing"], s["column_mismatches"]
+        (98, 1, {'Debit Amt': 1, 'Credit Amt': 1})
+    """
+    summary = {"shape": (parsed.shape, expected.shape), "columns": None, "dtypes": {}}
+    if list(parsed.columns) != list(expected.columns):
+        summary["columns"] = (list(parsed.columns), list(expected.columns))
+    columns = [c for c in expected.columns if c in parsed.columns]
+    for col in columns:
+        if parsed[col].dtype != expected[col].dtype:
+            summary["dtypes"][col] = (str(parsed[col].dtype), str(expected[col].dtype))
+    if not columns:
+        summary.update(matched=0, changed=0, missing=len(expected), extra=len(parsed), reordered=0,
+                       column_mismatches={}, examples={"changed": [], "missing": [], "extra": []})
+        return summary
+
+    ha, hb = row_hashes(parsed, columns), row_hashes(expected, columns)
+    matched, changed, extra, missing = align(ha, hb)
+    reordered = int(np.isin(ha[extra], hb[missing]).sum()) if extra and missing else 0
+
+    column_mismatches, changed_examples = {}, []
+    if changed:
+        ia = np.array([i for i, _ in changed])
+        ib = np.array([j for _, j in changed])
+        unequal = {}
+        for col in columns:
+            x, y = parsed[col].to_numpy()[ia], expected[col].to_numpy()[ib]
+            if x.dtype == object:
+                x = np.array([v.strip() if isinstance(v, str) else v for v in x], dtype=object)
+            if y.dtype == object:
+                y = np.array([v.strip() if isinstance(v, str) else v for v in y], dtype=object)
+            unequal[col] = ~_values_equal(x, y)
+            if unequal[col].any():
+                column_mismatches[col] = int(unequal[col].sum())
+        for k, (i, j) in enumerate(changed[:max_rows]):
+            cells = {c: (_py(parsed[c].iat[i]), _py(expected[c].iat[j])) for c in columns if unequal[c][k]}
+            changed_examples.append({"parsed_row": i, "expected_row": j, "cells": cells})
+
+    summary.update(
+        matched=matched, changed=len(changed), missing=len(missing), extra=len(extra),
+        reordered=reordered, column_mismatches=column_mismatches,
+        examples={
+            "changed": changed_examples,
+            "missing": [{"expected_row": j, "values": [_py(v) for v in expected[columns].iloc[j]]} for j in missing[:max_rows]],
+            "extra": [{"parsed_row": i, "values": [_py(v) for v in parsed[columns].iloc[i]]} for i in extra[:max_rows]],
+        },
+    )
+    return summary
+
+def format_diff(summary: dict) -> str:
+    """
+    Renders a `diff_frames` summary as compact text for LLM feedback.
+    """
+    lines = []
+    if summary["shape"][0] != summary["shape"][1]:
+        lines.append(f"Shape mismatch: {summary['shape'][0]} vs {summary['shape'][1]}")
+    if summary["columns"]:
+        lines.append(f"Column mismatch: {summary['columns'][0]} vs {summary['columns'][1]}")
+    for col, (got, want) in summary["dtypes"].items():
+        lines.append(f"Dtype mismatch: {col} is {got}, expected {want}")
+    lines.append(f"Rows: {summary['matched']} match, {summary['changed']} changed, "
+                 f"{summary['missing']} missing, {summary['extra']} extra")
+    if summary["reordered"]:
+        lines.append(f"{summary['reordered']} extra rows are identical to missing ones: rows are out of order")
+    if summary["column_mismatches"]:
+        lines.append("Mismatches per column (changed rows): "
+                     + ", ".join(f"{c}={n}" for c, n in summary["column_mismatches"].items()))
+    ex = summary["examples"]
+    if ex["changed"]:
+        lines.append("Changed rows (parsed vs expected):")
+        for e in ex["changed"]:
+            cells = "; ".join(f"{c}: {got!r} vs {want!r}" for c, (got, want) in e["cells"].items())
+            lines.append(f"  parsed row {e['parsed_row']} / expected row {e['expected_row']}: {cells}")
+    if ex["missing"]:
+        lines.append("Missing rows (in expected, not parsed):")
+        lines.extend(f"  expected row {e['expected_row']}: {e['values']}" for e in ex["missing"])
+    if ex["extra"]:
+        lines.append("Extra rows (parsed, not in expected):")
+        lines.extend(f"  parsed row {e['parsed_row']}: {e['values']}" for e in ex["extra"])
+    return "\n".join(lines)
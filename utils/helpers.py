@@ -1,17 +1,30 @@
 import pandas as pd
-import pdfplumber
-import re, traceback, importlib.util
+import os, re, time, itertools, tempfile, traceback, contextvars
+from concurrent.futures import ThreadPoolExecutor
+from utils.page_cache import page_text, file_digest
+from utils.backends import open_pdf
+from utils.stream import iter_pages
+from utils import sandbox, registry, trace
+from utils.diff import diff_frames, format_diff
 
-def load_parser_module(bank: str):
+# Page counts a candidate is validated on, in order, before the full document
+VALIDATION_TIERS = [int(n) for n in os.getenv("VALIDATION_TIERS", "1,5").split(",") if n.strip()]
+PREFIX_DIR = os.path.join(tempfile.gettempdir(), "parser_prefixes")
+
+@trace.timed("helper.load_parser_module")
+def load_parser_module(bank: str, path: str | None = None):
     """
     Dynamically imports a custom parser module for the specified bank.
 
     This function loads a bank-specific parser module located at 
-    'custom_parsers/{bank}_parser.py' using importlib's module loading capabilities.
+    'custom_parsers/{bank}_parser.py' through `utils.registry`, which keeps
+    the module loaded and only re-executes it when the file's content changes.
 
     Args:
         bank (str): Name of the bank identifier (must match the base name of 
                     the parser module file without the '_parser.py' suffix)
+        path (str | None): Load the module from this file instead, e.g. a
+                    candidate parser that has not been adopted yet
 
     Returns:
         module: Imported Python module object containing the bank's parser implementation
@@ -20,11 +33,9 @@ def load_parser_module(bank: str):
         >>> parser = load_parser_module("chase")
         >>> parser.parse(...)  # Would call the parse function from 'chase_parser.py'
     """
-    spec = importlib.util.spec_from_file_location(f"{bank}_parser", f"custom_parsers/{bank}_parser.py")
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+    return registry.load_module(f"{bank}_parser", path or registry.parser_path(bank))
 
+@trace.timed("helper.analyze_csv")
 def analyze_csv(csv_path: str):
     """
     Analyzes a CSV file and returns metadata and a sample.
@@ -51,6 +62,7 @@ def analyze_csv(csv_path: str):
     df = pd.read_csv(csv_path)
     return {"columns": list(df.columns), "shape": df.shape, "sample": df.head(3).to_dict("records")}
 
+@trace.timed("helper.extract_pdf_sample")
 def extract_pdf_sample(pdf_path: str):
     """
     Extracts up to 5 date-containing lines from a PDF's first two pages.
@@ -69,10 +81,10 @@ def extract_pdf_sample(pdf_path: str):
              - No matching date lines are found
     """
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with open_pdf(pdf_path) as pdf:
             lines = []
             for page in pdf.pages[:2]:
-                for l in (page.extract_text() or "").splitlines():
+                for l in page_text(page).splitlines():
                     if re.match(r'\d{2}[-/]\d{2}[-/]\d{4}', l.strip()):
                         lines.append(l.strip())
                         if len(lines) >= 5:
@@ -83,44 +95,165 @@ def extract_pdf_sample(pdf_path: str):
     except Exception:
         return ""
 
+@trace.timed("helper.detailed_compare")
 def detailed_compare(df1: pd.DataFrame, df2: pd.DataFrame) -> str:
     """
-    Compares two DataFrames and returns detailed differences.
+    Compares a parsed DataFrame with the expected one and returns a compact,
+    human-readable summary of the differences.
 
-    Performs three types of comparison:
-    1. Shape mismatch
-    2. Column ordering/renaming differences
-    3. Data mismatch in rows
+    Rows are hashed and aligned (see `utils.diff`), so the report stays useful
+    when shapes differ: a dropped row is reported once as missing instead of
+    shifting every later row.
 
     Args:
-        df1: First DataFrame for comparison
-        df2: Second DataFrame for comparison
+        df1: Parsed DataFrame
+        df2: Expected DataFrame
 
     Returns:
         str: Human-readable comparison results with:
-             - Shape differences (if any)
-             - Column differences (if any)
-             - First 5 row differences using pandas.DataFrame.compare()
+             - Shape, column and dtype differences (if any)
+             - Matched / changed / missing / extra row counts
+             - Mismatch counts per column
+             - Up to 10 example rows per category with their positions
 
     Example Output:
-        Shape mismatch: (100, 3) vs (99, 3)
-        Column mismatch: ['Date', 'Amount'] vs ['DATE', 'AMOUNT']
-        Differences (sample):
-            Date        0: 2023-09-01 vs 1: 2023-09-01
-            Amount      0: 45.00      vs 1: 45.00
-            ...
-    """
-    diffs = []
-    if df1.shape != df2.shape:
-        diffs.append(f"Shape mismatch: {df1.shape} vs {df2.shape}")
-    if list(df1.columns) != list(df2.columns):
-        diffs.append(f"Column mismatch: {list(df1.columns)} vs {list(df2.columns)}")
+        Shape mismatch: (99, 5) vs (100, 5)
+        Rows: 98 match, 1 changed, 1 missing, 0 extra
+        Mismatches per column (changed rows): Debit Amt=1, Credit Amt=1
+        Changed rows (parsed vs expected):
+          parsed row 0 / expected row 0: Debit Amt: nan vs 1935.3; Credit Amt: 1935.3 vs nan
+        Missing rows (in expected, not parsed):
+          expected row 57: ['03-08-2024', 'IMPS UPI Payment Amazon', 3886.08, nan, 4631.11]
+    """
     try:
-        comp = df1.compare(df2)
-        diffs.append("Differences (sample):\n" + comp.head(5).to_string())
-    except Exception:
-        diffs.append("Could not compute row differences.")
-    return "\n".join(diffs)
+        return format_diff(diff_frames(df1, df2))
+    except Exception as e:
+        return f"Shape: {df1.shape} vs {df2.shape}\nCould not compute row differences: {e}"
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes a DataFrame in place for parser output comparison.
+
+    Strips whitespace from all string columns and rewrites every column whose
+    name contains "date" as DD-MM-YYYY (parsed with dayfirst=True).
+
+    Args:
+        df: Parsed or expected DataFrame
+
+    Returns:
+        pd.DataFrame: The same DataFrame, normalized
+    """
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = df[col].str.strip()
+    for col in [c for c in df.columns if 'date' in c.lower()]:
+        df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce').dt.strftime("%d-%m-%Y")
+    return df
+
+def page_count(pdf_path: str) -> int:
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def prefix_pdf(pdf_path: str, pages: int) -> str:
+    """
+    Returns a PDF holding the first `pages` pages of `pdf_path`.
+
+    Prefixes are written once per source content and page count under
+    PREFIX_DIR and reused by later iterations.
+    """
+    out = os.path.join(PREFIX_DIR, f"{file_digest(pdf_path)}-{pages}.pdf")
+    if not os.path.exists(out):
+        import pypdfium2 as pdfium
+        src, dst = pdfium.PdfDocument(pdf_path), pdfium.PdfDocument.new()
+        try:
+            dst.import_pages(src, list(range(pages)))
+            os.makedirs(PREFIX_DIR, exist_ok=True)
+            tmp = f"{out}.{os.getpid()}.tmp"
+            dst.save(tmp)
+            os.replace(tmp, out)
+        finally:
+            dst.close()
+            src.close()
+    return out
+
+def parse_prefix(parser_module, pdf_path: str, pages: int) -> pd.DataFrame:
+    """
+    Runs a parser on the first `pages` pages of a PDF.
+
+    Parsers following the `parse_page`/`to_frame` contract (see
+    utils/prompt.py) run on those pages of the original file, so their
+    extraction comes from and goes to the page cache exactly like the full
+    run's. Other parsers get a prefix PDF (`prefix_pdf`), whose pages have
+    their own cache keys.
+    """
+    if not (hasattr(parser_module, "parse_page") and hasattr(parser_module, "to_frame")):
+        return parser_module.parse(prefix_pdf(pdf_path, pages))
+    chunks = iter_pages(pdf_path, parser_module.parse_page)
+    try:
+        rows = [row for page_rows in itertools.islice(chunks, pages) for row in page_rows]
+    finally:
+        chunks.close()
+    return parser_module.to_frame(rows)
+
+def compare_prefix(df_parsed: pd.DataFrame, df_exp: pd.DataFrame) -> tuple[bool, str]:
+    """
+    Checks rows parsed from the first pages of a PDF against the start of
+    the expected output.
+
+    The last parsed row is left to the full run, since a transaction may
+    continue on the next page.
+
+    Args:
+        df_parsed: Output of `parse_prefix`
+        df_exp: Normalized expected DataFrame for the whole document
+
+    Returns:
+        tuple: (bool, str) with "" on success, otherwise `detailed_compare`
+               output for the compared rows
+    """
+    df_parsed = normalize_frame(df_parsed.reset_index(drop=True))
+    if list(df_parsed.columns) != list(df_exp.columns) or len(df_parsed) > len(df_exp):
+        return False, detailed_compare(df_parsed, df_exp.iloc[:len(df_parsed)].reset_index(drop=True))
+    n = max(len(df_parsed) - 1, 0)
+    head, expected = df_parsed.iloc[:n], df_exp.iloc[:n].reset_index(drop=True)
+    if not head.equals(expected):
+        return False, detailed_compare(head, expected)
+    return True, ""
+
+def compare_stream(chunks, df_exp: pd.DataFrame) -> tuple[bool, str]:
+    """
+    Compares a stream of parsed DataFrame chunks against the expected output.
+
+    Each chunk is checked against the matching slice of `df_exp` as soon as it
+    arrives, and the stream is closed at the first mismatching chunk so the
+    rest of the PDF is never parsed.
+
+    Args:
+        chunks (iterable): DataFrames yielded by a parser's `parse_iter`
+        df_exp: Normalized expected DataFrame
+
+    Returns:
+        tuple: (bool, str) with "ALL MATCH" on success, otherwise the chunk
+               position followed by `detailed_compare` output
+    """
+    offset = 0
+    try:
+        for chunk in chunks:
+            chunk = normalize_frame(chunk.reset_index(drop=True))
+            expected = df_exp.iloc[offset:offset + len(chunk)].reset_index(drop=True)
+            if not chunk.equals(expected):
+                return False, (f"Mismatch in rows {offset}-{offset + len(chunk) - 1}:\n"
+                               + detailed_compare(chunk, expected))
+            offset += len(chunk)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    if offset != len(df_exp):
+        return False, f"Row count mismatch: parsed {offset} rows, expected {len(df_exp)}"
+    return True, "ALL MATCH"
 
 def test_parser(state) -> tuple[bool, str]:
     """
@@ -137,6 +270,8 @@ def test_parser(state) -> tuple[bool, str]:
                       - "bank": Bank identifier (filename base for parser module)
                       - "pdf_path": File path to test PDF file
                       - "csv_path": File path to expected CSV output
+                      - "parser_path" (optional): Parser file to test instead
+                        of custom_parsers/<bank>_parser.py
 
     Returns:
         tuple: (bool, str) where:
@@ -150,6 +285,30 @@ def test_parser(state) -> tuple[bool, str]:
     - Strips whitespace from all string columns
     - Normalizes date columns to d-m-Y format using dayfirst=True
 
+    Validation is tiered to fail fast: the parser is first run on just the
+    first page, then on the first 5 pages (VALIDATION_TIERS, default "1,5"),
+    and its rows are compared with the start of the CSV (see `parse_prefix`
+    and `compare_prefix`). Only when those pass is the full document parsed, and
+    a failing tier returns its diff without parsing the rest.
+
+    If the parser module defines `parse_iter`, the full document is first
+    compared chunk by chunk as it arrives (see `compare_stream`) and the test
+    stops at the first mismatch. `parse` must then match as well.
+
+    The generated code runs in a warm, resource-limited worker from
+    `utils.sandbox`, so infinite loops and memory blowups come back as
+    "ERROR DURING TEST" feedback instead of taking down the agent.
+
+    Verdicts are remembered per parser code and input files (see
+    `utils.registry`), so re-testing byte-identical code returns immediately.
+    Sandbox failures (timeouts, killed workers) are not remembered.
+
+    Timings from the worker (parser load, parse, compare) are merged into the
+    current trace (see `utils.trace`).
+
+    When the state lists several sample pairs under "samples", the parser is
+    tested against all of them at once (see `test_samples`).
+
     Example workflow:
         >>> state = {
         ...     "bank": "chase",
@@ -159,25 +318,137 @@ def test_parser(state) -> tuple[bool, str]:
         >>> test_parser(state)
         (True, "ALL MATCH")
     """
-    try:
-        df_exp = pd.read_csv(state["csv_path"])
-        parser_module = load_parser_module(state["bank"])
-        df_parsed = parser_module.parse(state["pdf_path"])
+    if len(state.get("samples") or []) > 1:
+        return test_samples(state, state["samples"])
+    with trace.span("helper.test_parser", sandbox=sandbox.ENABLED) as attrs:
+        key = registry.verdict_key(state)
+        verdict = registry.get_verdict(key)
+        attrs["cached_verdict"] = verdict is not None
+        if verdict is not None:
+            return verdict
+        if sandbox.ENABLED:
+            start = time.perf_counter()
+            ok, result = sandbox.get_pool().call(trace.collect, run_test, state)
+            if not ok:
+                attrs["sandbox_error"] = result["type"]
+                return False, sandbox.format_error(result)
+            result, spans = result
+            trace.merge(spans, start)
+        else:
+            result = run_test(state)
+        attrs["passed"] = bool(result[0])
+        registry.set_verdict(key, result)
+        return result
 
-        for col in df_parsed.select_dtypes(include=['object']).columns:
-            df_parsed[col] = df_parsed[col].str.strip()
-        for col in df_exp.select_dtypes(include=['object']).columns:
-            df_exp[col] = df_exp[col].str.strip()
+def test_samples(state, samples: list) -> tuple[bool, str]:
+    """
+    Tests a parser against several (pdf_path, csv_path) sample pairs in
+    parallel and combines the results into one feedback message.
+
+    Every sample goes to its own sandbox worker at the same time, so
+    iteration wall time follows the slowest sample rather than the sum. With
+    SANDBOX=0 they run in threads of the agent process instead, which
+    overlaps file I/O and the extraction work that releases the GIL but
+    speeds up less than separate workers. Verdicts are cached per
+    sample like in `test_parser`.
+
+    Args:
+        state (dict): Agent state (bank, optional parser_path)
+        samples (list): (pdf_path, csv_path) pairs; the first is the primary
+
+    Returns:
+        tuple: (bool, str) where the bool is True only if every sample
+               passes. The message starts with "ALL MATCH" or the pass rate,
+               lists each sample's result and time, then the feedback of
+               every failing sample.
+
+    Example Output:
+        Samples: 1/2 passed in 1.42s
+          PASS  data/icici/icici_sample.pdf  1.31s
+          FAIL  data/icici/2024_09.pdf  0.18s
 
-        date_cols = [c for c in df_parsed.columns if 'date' in c.lower()]
-        for col in date_cols:
-            df_parsed[col] = pd.to_datetime(df_parsed[col], dayfirst=True, errors='coerce').dt.strftime("%d-%m-%Y")
-            df_exp[col] = pd.to_datetime(df_exp[col], dayfirst=True, errors='coerce').dt.strftime("%d-%m-%Y")
+        Feedback for data/icici/2024_09.pdf:
+        Mismatch within the first 1 of 3 page(s) (the rest of the PDF was not parsed):
+        ...
+    """
+    with trace.span("helper.test_samples", samples=len(samples), sandbox=sandbox.ENABLED) as attrs:
+        started = time.perf_counter()
+        states = [{**state, "pdf_path": pdf, "csv_path": csv} for pdf, csv in samples]
+        keys = [registry.verdict_key(s) for s in states]
+        results, seconds, pending = {}, {}, {}
+        for i, key in enumerate(keys):
+            if (verdict := registry.get_verdict(key)) is not None:
+                results[i], seconds[i] = verdict, 0.0
+            elif sandbox.ENABLED:
+                pending[i] = (time.perf_counter(), sandbox.get_pool().submit(trace.collect, run_test_timed, states[i]))
+        for i, (start, future) in pending.items():
+            ok, value = future.result()
+            if ok:
+                (results[i], seconds[i]), spans = value
+                trace.merge(spans, start)
+                registry.set_verdict(keys[i], results[i])
+            else:
+                results[i], seconds[i] = (False, sandbox.format_error(value)), time.perf_counter() - start
+        if todo := [i for i in range(len(states)) if i not in results]:
+            with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+                futures = {i: pool.submit(contextvars.copy_context().run, run_test_timed, states[i]) for i in todo}
+            for i, future in futures.items():
+                results[i], seconds[i] = future.result()
+                registry.set_verdict(keys[i], results[i])
+
+        passed = sum(results[i][0] for i in range(len(samples)))
+        attrs["passed"] = passed
+        lines = [f"Samples: {passed}/{len(samples)} passed in {time.perf_counter() - started:.2f}s"]
+        lines += [f"  {'PASS' if results[i][0] else 'FAIL'}  {pdf}  {seconds[i]:.2f}s" for i, (pdf, _) in enumerate(samples)]
+        for i, (pdf, _) in enumerate(samples):
+            if not results[i][0]:
+                lines += ["", f"Feedback for {pdf}:", results[i][1]]
+        if passed == len(samples):
+            lines.insert(0, "ALL MATCH")
+        return passed == len(samples), "\n".join(lines)
+
+def run_test_timed(state) -> tuple[tuple[bool, str], float]:
+    """`run_test` plus its duration in seconds, measured where it runs."""
+    start = time.perf_counter()
+    result = run_test(state)
+    return result, time.perf_counter() - start
+
+def run_test(state) -> tuple[bool, str]:
+    """
+    In-process body of `test_parser`; runs inside a sandbox worker unless
+    SANDBOX=0.
+    """
+    try:
+        with trace.span("test.read_csv"):
+            df_exp = normalize_frame(pd.read_csv(state["csv_path"]))
+        parser_module = load_parser_module(state["bank"], state.get("parser_path"))
+        n_pages = page_count(state["pdf_path"])
+        for pages in VALIDATION_TIERS:
+            if pages >= n_pages:
+                break
+            with trace.span("test.tier", pages=pages) as attrs:
+                ok, report = compare_prefix(parse_prefix(parser_module, state["pdf_path"], pages), df_exp)
+                attrs["passed"] = ok
+            if not ok:
+                return False, (f"Mismatch within the first {pages} of {n_pages} page(s) "
+                               f"(the rest of the PDF was not parsed):\n{report}")
 
-        if df_parsed.equals(df_exp):
-            return True, "ALL MATCH"
+        streamed = hasattr(parser_module, "parse_iter")
+        if streamed:
+            with trace.span("test.parse_iter_compare"):
+                ok, report = compare_stream(parser_module.parse_iter(state["pdf_path"]), df_exp)
+            if not ok:
+                return False, report
 
-        return False, detailed_compare(df_parsed, df_exp)
+        # `parse` is what the service and incremental parsing call, so it is
+        # checked even when `parse_iter` already matched
+        with trace.span("test.parse"):
+            df_parsed = normalize_frame(parser_module.parse(state["pdf_path"]))
+        with trace.span("test.compare"):
+            if df_parsed.equals(df_exp):
+                return True, "ALL MATCH"
+            return False, (("parse_iter matches, but parse does not:\n" if streamed else "")
+                           + detailed_compare(df_parsed, df_exp))
 
     except Exception as e:
-        return False, f"ERROR DURING TEST: {e}\n{traceback.format_exc()}"
\ No newline at end of file
+        return False, f"ERROR DURING TEST: {e}\n{traceback.format_exc()}"
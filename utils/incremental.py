@@ -0,0 +1,192 @@
+"""
+Incremental re-parsing of growing statements
+
+Monthly statements are often re-issued with pages appended. Instead of
+re-parsing every page, `parse_incremental` keeps a manifest per document
+(MANIFEST_DIR, default .cache/manifests) with a content hash for each page
+and the output of the parser's `parse_page` for it. On the next run only
+pages whose hash is not in the manifest are opened and parsed; all other
+pages reuse their stored output, and the rows of every page are passed to
+the parser's `to_frame` in page order, exactly like its `parse` does.
+
+Page hashes cover the page's decoded content streams, its media box and its
+resources with everything they reference: Form XObjects (whose own streams
+and resources may draw all of the page's text), font encodings and ToUnicode
+maps. They are read with pdfminer without interpreting the page, so hashing
+costs a small fraction of extraction. A manifest is only reused with
+the same parser code, layout fingerprint and PDF backend.
+
+This works for parsers following the `parse_page`/`to_frame` contract (see
+utils/prompt.py); other parsers fall back to a full `parse`.
+
+Usage:
+    python -m utils.incremental icici statements/2025_07.pdf --document acct-1234
+"""
+
+import os, json, zlib, argparse
+import xxhash
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+from pdfminer.psparser import LIT
+from utils.backends import open_pdf, get_backend
+from utils import registry, trace
+
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", ".cache/manifests")
+LITERAL_IMAGE = LIT("Image")
+
+
+def _digest(obj, memo: dict) -> bytes:
+    """
+    Hashes a PDF object together with every object it references.
+
+    Streams contribute their attributes and decoded data, except images whose
+    pixels cannot change the extracted text. Referenced objects are hashed once
+    per document (`memo`, keyed by object id), which also breaks cycles.
+    """
+    objid = obj.objid if isinstance(obj, PDFObjRef) else None
+    if objid is not None:
+        if objid in memo:
+            return memo[objid]
+        memo[objid] = f"ref:{objid}".encode()
+        obj = resolve1(obj)
+    h = xxhash.xxh3_128()
+    if isinstance(obj, PDFStream):
+        h.update(_digest(obj.attrs, memo))
+        if obj.get("Subtype") is not LITERAL_IMAGE:
+            h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            if key != "Parent":
+                h.update(str(key).encode())
+                h.update(_digest(obj[key], memo))
+    elif isinstance(obj, list):
+        for item in obj:
+            h.update(_digest(item, memo))
+    else:
+        h.update(repr(obj).encode())
+    out = h.digest()
+    if objid is not None:
+        memo[objid] = out
+    return out
+
+def page_hashes(pdf_path: str) -> list[str]:
+    """
+    Returns one content hash per page of a PDF, in page order.
+    """
+    out = []
+    with open(pdf_path, "rb") as f:
+        doc = PDFDocument(PDFParser(f))
+        memo = {}
+        for page in PDFPage.create_pages(doc):
+            h = xxhash.xxh3_128(repr(page.mediabox).encode())
+            h.update(_digest(page.resources or {}, memo))
+            for stream in page.contents:
+                h.update(resolve1(stream).get_data())
+            out.append(h.hexdigest())
+    return out
+
+def _manifest_path(document: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{xxhash.xxh3_64(document.encode()).hexdigest()}.json.z")
+
+def _load(path: str) -> dict | None:
+    try:
+        with open(path, "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+    except (OSError, ValueError, zlib.error):
+        return None
+
+def _store(path: str, manifest: dict) -> bool:
+    try:
+        blob = zlib.compress(json.dumps(manifest, separators=(",", ":")).encode(), 6)
+    except (TypeError, ValueError):  # page output is not JSON-serializable
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    return True
+
+def parser_version(module, bank: str) -> str:
+    """
+    Identifies what a page's parsed output depends on besides its content:
+    parser source, the bank's layout fingerprint and the PDF backend.
+    """
+    with open(module.__file__, "rb") as f:
+        parts = [registry.source_digest(f.read())]
+    layout = registry.layout_path(bank)
+    if os.path.exists(layout):
+        with open(layout, "rb") as f:
+            parts.append(registry.source_digest(f.read()))
+    return ":".join(parts + [get_backend()])
+
+def parse_incremental(bank: str, pdf_path: str, document: str | None = None,
+                      parser_path: str | None = None) -> tuple:
+    """
+    Parses a statement, re-parsing only pages not seen in its last run.
+
+    Args:
+        bank (str): Bank whose parser to use
+        pdf_path (str): Statement PDF
+        document (str | None): Manifest name; defaults to the PDF's absolute
+                               path. Use a stable id when the file moves or is
+                               uploaded under a temporary name.
+        parser_path (str | None): Parser file instead of custom_parsers/<bank>_parser.py
+
+    Returns:
+        tuple: (DataFrame, stats) where stats has "pages", "reused" and
+               "parsed" page counts; the DataFrame equals `parse(pdf_path)`
+
+    Example:
+        >>> df, stats = parse_incremental("icici", "statements/acct.pdf")
+        >>> stats        # after two pages were appended to a 40-page file
+        {'pages': 42, 'reused': 40, 'parsed': 2}
+    """
+    module = registry.load_module(f"{bank}_parser", parser_path or registry.parser_path(bank))
+    with trace.span("incremental.parse", bank=bank) as attrs:
+        if not (hasattr(module, "parse_page") and hasattr(module, "to_frame")):
+            df = module.parse(pdf_path)
+            attrs.update(pages=None, reused=0, parsed=None)
+            return df, {"pages": None, "reused": 0, "parsed": None}
+
+        path = _manifest_path(document or os.path.abspath(pdf_path))
+        version = parser_version(module, bank)
+        manifest = _load(path)
+        known = {}
+        if manifest and manifest.get("version") == version:
+            known = {p["hash"]: p["output"] for p in manifest["pages"]}
+
+        hashes = page_hashes(pdf_path)
+        outputs = [known.get(h) for h in hashes]
+        todo = [i for i, out in enumerate(outputs) if out is None]
+        if todo:
+            with open_pdf(pdf_path) as pdf:
+                for i in todo:
+                    outputs[i] = module.parse_page(pdf.pages[i])
+
+        rows = [row for out in outputs for row in out]
+        df = module.to_frame(rows)
+        if todo or len(known) != len(set(hashes)):
+            _store(path, {"version": version, "pdf": os.path.abspath(pdf_path),
+                          "pages": [{"hash": h, "output": out} for h, out in zip(hashes, outputs)]})
+        stats = {"pages": len(hashes), "reused": len(hashes) - len(todo), "parsed": len(todo)}
+        attrs.update(stats)
+        return df, stats
+
+
+def main():
+    p = argparse.ArgumentParser(description="Parse a statement, re-parsing only new or changed pages.")
+    p.add_argument("bank")
+    p.add_argument("pdf")
+    p.add_argument("--document", help="Manifest name (default: the PDF's absolute path)")
+    p.add_argument("--out", help="Write the parsed rows to this CSV")
+    args = p.parse_args()
+    df, stats = parse_incremental(args.bank, args.pdf, args.document)
+    print(f"{stats['pages']} pages: {stats['reused']} reused, {stats['parsed']} parsed; {len(df)} rows")
+    if args.out:
+        df.to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Table layout fingerprints
+
+Statements from one bank share a template: the transaction table sits in
+the same region of every page and its columns at the same x-positions. A
+layout fingerprint is learned once per bank from the sample PDF and stored
+next to the parser (custom_parsers/<bank>_layout.json):
+
+- "columns": the CSV columns, in table order
+- "edges":   x-positions of the column boundaries (len(columns) + 1)
+- "bbox":    (x0, top, x1, bottom) of the table body, below the header row
+- "row_pitch", "page_size" and "sample" (the PDF it was learned from)
+
+Parsers then crop every page to "bbox" and assign each word box to the
+column its center falls in (`table_rows`), so titles, headers and footers
+are never extracted and amounts land in their own column instead of being
+guessed from token positions.
+
+Learning a layout:
+
+    python -m utils.layout icici      # data/icici/icici_sample.pdf + result.csv
+"""
+
+import os, json, bisect, argparse
+import numpy as np
+import pandas as pd
+from utils.backends import open_pdf, LINE_TOLERANCE
+from utils.page_cache import page_words, file_digest
+from utils.registry import layout_path, banks
+
+_loaded = {}
+
+
+def _lines(words: list[dict]) -> list[list[dict]]:
+    """Groups word boxes into lines (tops within LINE_TOLERANCE), left to right."""
+    lines, line_top = [], None
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if line_top is None or w["top"] - line_top > LINE_TOLERANCE:
+            lines.append([])
+            line_top = w["top"]
+        lines[-1].append(w)
+    return [sorted(line, key=lambda w: w["x0"]) for line in lines]
+
+def _match_header(line: list[dict], columns: list[str]) -> list[tuple[float, float]] | None:
+    """
+    Returns the (x0, x1) span of every column name in a header line, or None
+    if the line does not spell out all `columns` in order.
+    """
+    tokens = [w["text"].lower() for w in line]
+    spans, i = [], 0
+    for col in columns:
+        parts = col.lower().split()
+        while i < len(tokens) and tokens[i:i + len(parts)] != parts:
+            i += 1
+        if i == len(tokens):
+            return None
+        spans.append((line[i]["x0"], line[i + len(parts) - 1]["x1"]))
+        i += len(parts)
+    return spans
+
+def learn_layout(pdf_path: str, columns: list[str]) -> dict:
+    """
+    Learns the table layout of a statement from its header row and word boxes.
+
+    The header row is the first line that contains every column name in
+    order. Column boundaries start at the midpoints between header names and
+    are then moved to the middle of the gap between the words actually found
+    in neighbouring columns. The table body spans from below the header to
+    half a row below the last line that fills at least half of the columns.
+
+    Args:
+        pdf_path (str): Sample statement PDF
+        columns (list): Expected CSV columns, as spelled in the table header
+
+    Returns:
+        dict: Layout fingerprint (see module docstring)
+
+    Raises:
+        ValueError: If no page has a header row with all `columns`
+    """
+    pages = []
+    with open_pdf(pdf_path) as pdf:
+        size = (float(pdf.pages[0].width), float(pdf.pages[0].height))
+        for page in pdf.pages:
+            lines = _lines(page_words(page))
+            for n, line in enumerate(lines):
+                if (spans := _match_header(line, columns)) is not None:
+                    pages.append((line, spans, lines[n + 1:]))
+                    break
+    if not pages:
+        raise ValueError(f"No header row with columns {columns} in {pdf_path}")
+
+    spans = pages[0][1]
+    centers = [(a + b) / 2 for a, b in spans]
+    cuts = [(spans[i][1] + spans[i + 1][0]) / 2 for i in range(len(spans) - 1)]
+    lo = [a for a, _ in spans]
+    hi = [b for _, b in spans]
+    rows, body_tops, row_bottoms = [], [], []
+    for header, _, body in pages:
+        header_bottom = max(w["bottom"] for w in header)
+        first = None
+        for line in body:
+            cols = np.searchsorted(cuts, [(w["x0"] + w["x1"]) / 2 for w in line])
+            if len(set(cols)) * 2 < len(columns):
+                continue
+            for w, c in zip(line, cols):
+                lo[c], hi[c] = min(lo[c], w["x0"]), max(hi[c], w["x1"])
+            first = line[0]["top"] if first is None else first
+            rows.append(line[0]["top"])
+            row_bottoms.append(max(w["bottom"] for w in line))
+        if first is not None:
+            body_tops.append((header_bottom + first) / 2)
+    if not rows:
+        raise ValueError(f"No table rows below the header in {pdf_path}")
+
+    inner = [(hi[i] + lo[i + 1]) / 2 if hi[i] < lo[i + 1] else cuts[i] for i in range(len(cuts))]
+    gaps = [lo[i + 1] - hi[i] for i in range(len(cuts)) if hi[i] < lo[i + 1]]
+    pad = min(gaps) / 2 if gaps else LINE_TOLERANCE
+    steps = np.diff(rows)  # rows restart at the top of each page; negative steps are skipped
+    pitch = float(np.median(steps[steps > 0])) if (steps > 0).any() else 2 * LINE_TOLERANCE
+    edges = [max(0.0, lo[0] - pad), *inner, min(size[0], hi[-1] + pad)]
+    bbox = [edges[0], min(body_tops), edges[-1], min(size[1], max(row_bottoms) + pitch / 2)]
+    return {
+        "columns": list(columns),
+        "edges": [round(e, 2) for e in edges],
+        "bbox": [round(b, 2) for b in bbox],
+        "row_pitch": round(pitch, 2),
+        "page_size": [round(s, 2) for s in size],
+        "sample": {"pdf": pdf_path, "digest": file_digest(pdf_path), "header_centers": [round(c, 2) for c in centers]},
+    }
+
+def save_layout(bank: str, layout: dict) -> str:
+    """Writes a bank's layout fingerprint next to its parser and returns the path."""
+    path = layout_path(bank)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(layout, f, indent=2)
+    _loaded.pop(path, None)
+    return path
+
+def load_layout(bank: str) -> dict | None:
+    """
+    Returns a bank's stored layout fingerprint, or None if it has none.
+
+    Reloaded only when the file changes, so parsers may call it per page.
+    """
+    path = layout_path(bank)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = _loaded[path] = (mtime, json.load(f))
+    return cached[1]
+
+def ensure_layout(bank: str, pdf_path: str, columns: list[str]) -> dict | None:
+    """
+    Returns the bank's layout, learning and saving it first if there is none
+    or it was learned from a different sample PDF or column set.
+
+    Returns None when the sample has no recognizable table header.
+    """
+    layout = load_layout(bank)
+    if layout and layout["columns"] == list(columns) and layout["sample"]["digest"] == file_digest(pdf_path):
+        return layout
+    try:
+        layout = learn_layout(pdf_path, columns)
+    except ValueError:
+        return None
+    save_layout(bank, layout)
+    return layout
+
+def table_rows(page, layout: dict) -> list[list[str]]:
+    """
+    Extracts the table rows of one page using a layout fingerprint.
+
+    The page is cropped to layout["bbox"] before its words are extracted
+    (cached per bbox, see `utils.page_cache.page_words`); words are grouped
+    into lines by `_lines`, as when the layout was learned, and each word goes
+    to the column whose edges contain its center. Words of one cell are
+    joined left to right with single spaces.
+
+    Args:
+        page: Page from `utils.backends.open_pdf` (any backend)
+        layout (dict): Fingerprint from `load_layout`/`learn_layout`
+
+    Returns:
+        list: One list of len(layout["columns"]) cell strings per table line,
+              top to bottom; empty cells are ""
+
+    Example:
+        >>> table_rows(page, load_layout("icici"))[0]
+        ['01-08-2024', 'Salary Credit XYZ Pvt Ltd', '1935.3', '', '6864.58']
+    """
+    edges = layout["edges"][1:-1]
+    rows = []
+    for line in _lines(page_words(page, bbox=tuple(layout["bbox"]))):
+        cells = [[] for _ in range(len(edges) + 1)]
+        for w in line:
+            cells[bisect.bisect_left(edges, (w["x0"] + w["x1"]) / 2)].append(w["text"])
+        rows.append([" ".join(cell) for cell in cells])
+    return rows
+
+def layout_similarity(a: dict | None, b: dict | None) -> float:
+    """
+    Scores how alike two layout fingerprints are, from 0 to 1.
+
+    Half of the score is the overlap of the column names (Jaccard); the other
+    half is geometric and only counts when both tables have the same columns:
+    1 when column edges and table bbox coincide, falling to 0 as their mean
+    offset reaches 5% of the page width.
+    """
+    if not a or not b:
+        return 0.0
+    cols_a, cols_b = set(a["columns"]), set(b["columns"])
+    score = 0.5 * len(cols_a & cols_b) / len(cols_a | cols_b)
+    if a["columns"] == b["columns"]:
+        offset = np.mean(np.abs(np.subtract(a["edges"] + a["bbox"], b["edges"] + b["bbox"])))
+        score += 0.5 * max(0.0, 1 - offset / (0.05 * max(a["page_size"][0], b["page_size"][0])))
+    return round(float(score), 4)
+
+def rank_parsers(layout: dict | None, exclude: str = "") -> list[tuple[float, str]]:
+    """
+    Ranks the existing parsers under custom_parsers/ by how closely their
+    bank's layout fingerprint matches `layout`.
+
+    Args:
+        layout (dict | None): Fingerprint of the new bank's sample
+        exclude (str): Bank to leave out (the one being onboarded)
+
+    Returns:
+        list: (similarity, bank) pairs, most similar first; banks without a
+              stored layout score 0
+    """
+    return sorted(((layout_similarity(layout, load_layout(b)), b) for b in banks() if b != exclude),
+                  key=lambda sb: -sb[0])
+
+
+def main():
+    p = argparse.ArgumentParser(description="Learn a bank's table layout from its sample PDF and CSV.")
+    p.add_argument("bank")
+    p.add_argument("--pdf", help="Sample PDF (default data/<bank>/<bank>_sample.pdf)")
+    p.add_argument("--csv", help="Expected CSV (default data/<bank>/result.csv)")
+    args = p.parse_args()
+    pdf = args.pdf or f"data/{args.bank}/{args.bank}_sample.pdf"
+    columns = list(pd.read_csv(args.csv or f"data/{args.bank}/result.csv", nrows=0).columns)
+    layout = learn_layout(pdf, columns)
+    print(f"Layout written to {save_layout(args.bank, layout)}")
+    print(json.dumps({k: layout[k] for k in ("edges", "bbox", "row_pitch")}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os, json, zlib
+import xxhash
+
+CACHE_DIR = os.getenv("PAGE_CACHE_DIR", ".cache/pages")
+MAX_BYTES = int(float(os.getenv("PAGE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+_digests = {}
+_written = 0
+
+def file_digest(pdf_path: str) -> str:
+    """
+    Returns the xxh3-128 content hash of a file.
+
+    Hashes are memoized per (path, size, mtime) so repeated lookups for the
+    same unchanged file do not re-read it.
+
+    Args:
+        pdf_path (str): File system path to the file
+
+    Returns:
+        str: 32-character hex digest of the file contents
+    """
+    st = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns)
+    if key not in _digests:
+        h = xxhash.xxh3_128()
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _digests[key] = h.hexdigest()
+    return _digests[key]
+
+def _page_digest(page) -> str:
+    pdf = page.pdf
+    if getattr(pdf, "path", None):
+        return file_digest(str(pdf.path))
+    digest = getattr(pdf, "_content_digest", None)
+    if digest is None:
+        pos = pdf.stream.tell()
+        pdf.stream.seek(0)
+        digest = xxhash.xxh3_128(pdf.stream.read()).hexdigest()
+        pdf.stream.seek(pos)
+        pdf._content_digest = digest
+    return digest
+
+def _entry_path(page, kind: str, params: dict) -> str:
+    digest = _page_digest(page)
+    params = {**params, "backend": getattr(page.pdf, "backend", "pdfplumber")}
+    param_hash = xxhash.xxh64(json.dumps(params, sort_keys=True, default=str)).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], f"{digest}-{page.page_number}-{kind}-{param_hash}.json.z")
+
+def _load(path: str):
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(zlib.decompress(f.read()))
+        os.utime(path)
+        return data
+    except (OSError, ValueError, zlib.error):
+        return None
+
+def _store(path: str, data) -> None:
+    global _written
+    blob = zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    _written += len(blob)
+    if _written >= MAX_BYTES // 10:
+        _written = 0
+        evict()
+
+def evict(max_bytes: int | None = None) -> int:
+    """
+    Trims the page cache to `max_bytes`, removing least recently used entries.
+
+    Entries are touched on every hit, so modification time doubles as the
+    last-access time.
+
+    Args:
+        max_bytes (int | None): Size limit; defaults to PAGE_CACHE_MAX_MB
+
+    Returns:
+        int: Number of entries removed
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, os.path.join(root, name)))
+    total = sum(e[1] for e in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+def page_text(page, **kwargs) -> str:
+    """
+    Returns `page.extract_text(**kwargs)`, served from the on-disk cache.
+
+    Entries are keyed by the PDF's content hash, the 1-based page number, the
+    PDF backend and the extraction arguments, so a renamed copy of a PDF still
+    hits the cache and different settings never collide. Set PAGE_CACHE_DIR
+    to an empty string to disable caching.
+
+    Args:
+        page: Page from `utils.backends.open_pdf` (any backend)
+        **kwargs: Arguments forwarded to `page.extract_text`
+
+    Returns:
+        str: Page text ("" for pages without text)
+
+    Example:
+        >>> with open_pdf("data/icici/icici_sample.pdf") as pdf:
+        ...     text = page_text(pdf.pages[0])
+    """
+    if not CACHE_DIR:
+        return page.extract_text(**kwargs) or ""
+    path = _entry_path(page, "text", kwargs)
+    text = _load(path)
+    if text is None:
+        text = page.extract_text(**kwargs) or ""
+        _store(path, text)
+    return text
+
+def _extract_words(page, bbox, kwargs) -> list[dict]:
+    if bbox is None:
+        return page.extract_words(**kwargs)
+    x0, top, x1, bottom = bbox
+    bbox = (max(0, x0), max(0, top), min(page.width, x1), min(page.height, bottom))
+    return page.crop(bbox).extract_words(**kwargs)
+
+def page_words(page, bbox: tuple | None = None, **kwargs) -> list[dict]:
+    """
+    Returns `page.extract_words(**kwargs)`, served from the on-disk cache.
+
+    Word boxes are stored column-wise (one list per key) to keep entries
+    small; they are returned in pdfplumber's list-of-dicts shape.
+
+    Args:
+        page: Page from `utils.backends.open_pdf` (any backend)
+        bbox (tuple | None): (x0, top, x1, bottom) region to crop to before
+                             extracting, clipped to the page; part of the key
+        **kwargs: Arguments forwarded to `page.extract_words`
+
+    Returns:
+        list: Word dicts with "text", "x0", "x1", "top", "bottom", ...
+
+    Example:
+        >>> words = page_words(pdf.pages[0])
+        >>> words[0]["text"], words[0]["x0"]
+        ('ChatGPT', 158.96875)
+    """
+    if not CACHE_DIR:
+        return _extract_words(page, bbox, kwargs)
+    # "clip": crops cut straddling words like pdfplumber; keeps out entries cached before that
+    path = _entry_path(page, "words", {**kwargs, "bbox": bbox, "clip": True} if bbox else kwargs)
+    cols = _load(path)
+    if cols is None:
+        words = _extract_words(page, bbox, kwargs)
+        keys = list(words[0]) if words else []
+        _store(path, {k: [w[k] for w in words] for k in keys})
+        return words
+    keys = list(cols)
+    return [dict(zip(keys, values)) for values in zip(*cols.values())]
@@ -0,0 +1,86 @@
+import os, sys
+from concurrent.futures import ProcessPoolExecutor
+from utils.backends import open_pdf
+from utils.registry import load_module
+
+def page_ranges(n_pages: int, workers: int, per_worker: int = 4) -> list[tuple[int, int]]:
+    """
+    Splits a page count into contiguous (start, stop) ranges for a process pool.
+
+    Each worker gets about `per_worker` ranges so that a slow page does not
+    leave the rest of the pool idle at the end of the run.
+
+    Args:
+        n_pages (int): Total number of pages in the PDF
+        workers (int): Number of worker processes
+        per_worker (int): Target number of ranges per worker
+
+    Returns:
+        list: Ordered list of (start, stop) tuples covering range(n_pages)
+
+    Example:
+        >>> page_ranges(10, 2, per_worker=2)
+        [(0, 3), (3, 6), (6, 9), (9, 10)]
+    """
+    chunks = max(1, min(n_pages, workers * per_worker))
+    size = -(-n_pages // chunks)
+    return [(i, min(i + size, n_pages)) for i in range(0, n_pages, size)]
+
+def _resolve_page_fn(module_name: str, module_file: str, fn_name: str):
+    """
+    Finds a parser's page function inside a worker process.
+
+    Generated parsers are loaded from file without being registered in
+    `sys.modules`, so the worker loads the module from its path through
+    `utils.registry` when it cannot find it by name; the registry keeps it
+    loaded until the file's content changes.
+    """
+    mod = sys.modules.get(module_name)
+    if mod is None or os.path.abspath(getattr(mod, "__file__", "") or "") != module_file:
+        mod = load_module(module_name, module_file)
+    return getattr(mod, fn_name)
+
+def _run_page_range(task) -> list:
+    """
+    Worker entry point: opens the PDF itself and parses pages [start, stop).
+    """
+    module_name, module_file, fn_name, pdf_path, start, stop = task
+    page_fn = _resolve_page_fn(module_name, module_file, fn_name)
+    with open_pdf(pdf_path) as pdf:
+        return [page_fn(pdf.pages[i]) for i in range(start, stop)]
+
+def map_pages(pdf_path: str, page_fn, workers: int | None = 1) -> list[list]:
+    """
+    Applies a per-page parse function to every page of a PDF, optionally
+    across a process pool.
+
+    With `workers=1` the PDF is walked serially in this process. Otherwise the
+    page range is split with `page_ranges`, every worker opens the PDF on its
+    own and the per-page results are merged back in page order, so the output
+    is identical to the serial path.
+
+    Args:
+        pdf_path (str): File system path to the PDF file
+        page_fn (callable): Module-level function taking a page (see
+                            utils.backends) and returning what it found on it
+        workers (int | None): Number of processes; None uses every CPU
+
+    Returns:
+        list: One `page_fn` result per page, in page order
+
+    Example:
+        >>> from custom_parsers.icici_parser import parse_page
+        >>> pages = map_pages("data/icici/icici_sample.pdf", parse_page, workers=4)
+        >>> rows = [r for page_rows in pages for r in page_rows]
+    """
+    workers = workers or os.cpu_count() or 1
+    with open_pdf(pdf_path) as pdf:
+        if workers <= 1 or len(pdf.pages) <= 1:
+            return [page_fn(page) for page in pdf.pages]
+        n_pages = len(pdf.pages)
+
+    module_file = os.path.abspath(page_fn.__code__.co_filename)
+    tasks = [(page_fn.__module__, module_file, page_fn.__name__, pdf_path, start, stop)
+             for start, stop in page_ranges(n_pages, workers)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return [page_rows for chunk in pool.map(_run_page_range, tasks) for page_rows in chunk]
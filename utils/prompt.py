@@ -1,8 +1,180 @@
-def create_prompt(state) -> str:
+"""
+Prompt builder
+
+`build_prompt` assembles the code-generation prompt within a token budget
+(PROMPT_TOKEN_BUDGET, default 4000), counted with tiktoken. If the encoding
+cannot be loaded (e.g. offline without a tiktoken cache), a characters/4
+estimate is used instead.
+
+The fixed rules are always included. When the bank has a learned table
+layout (`utils.layout`), they ask for a parser that splits the cropped table
+into columns by word position; otherwise for one that parses text lines.
+The variable sections are fitted into the remaining budget in priority
+order, headers and "omitted" markers included, so the prompt never exceeds
+the budget unless the fixed rules alone do:
+
+1. Test feedback, compressed first: tracebacks are cut down to the frames in
+   the generated parser plus the exception line, and diff reports keep their
+   summary lines while example rows are trimmed to fit.
+2. The closest existing parser, when preflight found one (src/nodes.py).
+3. PDF sample text.
+4. CSV sample rows.
+"""
+
+import os, re
+from functools import lru_cache
+
+TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+ENCODING = os.getenv("PROMPT_ENCODING", "cl100k_base")
+# Rough LLM latency model recorded in traces: fixed overhead plus prompt cost.
+LATENCY_BASE_S = float(os.getenv("PROMPT_LATENCY_BASE_S", "2.0"))
+LATENCY_PER_1K_TOKENS_S = float(os.getenv("PROMPT_LATENCY_PER_1K_TOKENS_S", "0.8"))
+
+GENERATED_FILE = re.compile(r'File "[^"]*_parser(_\d+)?\.py"')
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING)
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Returns the token count of `text` (tiktoken, or a characters/4 estimate).
+    """
+    enc = _encoder()
+    return len(enc.encode(text, disallowed_special=())) if enc else -(-len(text) // 4)
+
+def estimate_latency(tokens: int) -> float:
+    """
+    Returns the estimated LLM round trip in seconds for a prompt of `tokens`.
+    """
+    return LATENCY_BASE_S + LATENCY_PER_1K_TOKENS_S * tokens / 1000
+
+def compress_traceback(text: str) -> str:
+    """
+    Cuts every Python traceback in `text` down to the frames in the generated
+    parser file (with their source lines, minus the ^^^ markers) and the
+    final exception line.
+
+    Tracebacks with no frame in the parser keep their innermost frame, so the
+    failing library call is still visible.
+
+    Example:
+        >>> print(compress_traceback(feedback))
+        ERROR DURING TEST: could not convert string to float: 'Dr'
+        Traceback (most recent call last):
+          File "custom_parsers/icici_parser.py", line 21, in to_frame
+            amount = float(parts[-2])
+        ValueError: could not convert string to float: 'Dr'
+    """
+    out, frames, in_tb = [], [], False
+    for line in text.splitlines():
+        if line.startswith("Traceback (most recent call last)"):
+            out.append(line)
+            frames, in_tb = [], True
+        elif in_tb and line.startswith("  File "):
+            frames.append([line])
+        elif in_tb and line.startswith("    "):
+            if frames and line.strip().strip("^~"):
+                frames[-1].append(line)
+        elif in_tb and line.strip() and not line.startswith(" "):
+            kept = [f for f in frames if GENERATED_FILE.search(f[0])] or frames[-1:]
+            if len(kept) < len(frames):
+                out.append(f"  ... {len(frames) - len(kept)} library frame(s) omitted")
+            out.extend(l for f in kept for l in f)
+            out.append(line)
+            in_tb = False
+        elif not in_tb:
+            out.append(line)
+    if in_tb:
+        out.extend(l for f in frames[-1:] for l in f)
+    return "\n".join(out)
+
+def fit_lines(lines: list[str], budget: int, keep=lambda line: True) -> list[str]:
+    """
+    Drops lines from the end until the block fits in `budget` tokens.
+
+    Lines for which `keep(line)` is True (e.g. diff summary lines) are dropped
+    only after every other line is gone; a marker notes how many were cut and
+    counts against the budget. Returns [] if not even the marker fits.
+    """
+    costs = [count_tokens(l) + 1 for l in lines]
+    total = sum(costs)
+    if total <= budget:
+        return list(lines)
+    budget -= count_tokens(f"... ({len(lines)} more lines omitted)") + 1
+    dropped = set()
+    for pass_keep in (False, True):
+        for i in reversed(range(len(lines))):
+            if total <= budget:
+                break
+            if i not in dropped and keep(lines[i]) == pass_keep:
+                dropped.add(i)
+                total -= costs[i]
+    if total > budget:
+        return []
+    out = [l for i, l in enumerate(lines) if i not in dropped]
+    out.append(f"... ({len(dropped)} more lines omitted)")
+    return out
+
+def _cost(section: list[str]) -> int:
+    """Tokens a section adds to the prompt, including the newline joining it."""
+    return count_tokens("\n".join(section)) + 1 if section else 0
+
+def summarize_feedback(feedback: str, budget: int) -> str:
+    """
+    Compresses test feedback to at most about `budget` tokens.
+
+    Tracebacks are compressed first; then indented detail lines (diff example
+    rows, traceback frames) are trimmed before the top-level summary lines.
+    """
+    text = compress_traceback(feedback)
+    return "\n".join(fit_lines(text.splitlines(), budget, keep=lambda l: not l.startswith("  ")))
+
+def _text_rules() -> list[str]:
+    return [
+        "- Define a module-level `parse_page(page) -> list` that only returns the text lines of one page (from `page_text(page)`). It must not depend on other pages.",
+        "- `parse` must collect lines with `map_pages(pdf_path, parse_page, workers)`, which returns one line list per page in page order, and pass all of them to `to_frame`. Do not open the PDF in `parse` itself.",
+        "- Read page content only through `page_text(page)` and `page_words(page)` (cached, backend-independent extract_text/extract_words). Pages may come from PyMuPDF or pypdfium2 instead of pdfplumber, so never call `page.extract_text()`, `page.extract_words()` or any other pdfplumber-only page method directly.",
+        "- Define `to_frame(lines: list, prev_balance: float = np.nan) -> pd.DataFrame` and do all extraction there, vectorized: put the lines in one pd.Series, pull every field out with a single `str.extract` regex using named groups, drop non-matching lines, convert amounts with `pd.to_numeric`. No per-line Python loops, no `split()`/`float()` per line.",
+        "- If debit and credit share one amount position in the text, decide them from the running balance with NumPy: `delta = np.diff(balance, prepend=prev_balance)`; credit where delta > 0, debit where delta < 0. Only rows with no previous balance (NaN delta) may fall back to a heuristic.",
+        "- Also define `parse_iter(pdf_path: str)` that walks `iter_pages(pdf_path, parse_page)` (from utils.stream), yields `to_frame(lines, prev_balance)` for each non-empty page and carries the last balance into the next page. Concatenating its chunks must equal `parse(pdf_path)`.",
+    ]
+
+def _layout_rules(state) -> list[str]:
+    layout = state['layout']
+    return [
+        f"- The table layout of this bank was learned from the sample: columns {layout['columns']} split at x = {layout['edges']}, table body bbox {layout['bbox']}.",
+        f"- Define a module-level `parse_page(page) -> list` that returns `table_rows(page, load_layout('{state['bank']}'))` (from utils.layout). It crops the page to the table and returns one list of cell strings per table line, in column order, with \"\" for empty cells. Never call pdfplumber page methods directly.",
+        "- `parse` must collect rows with `map_pages(pdf_path, parse_page, workers)`, which returns one row list per page in page order, and pass all of them to `to_frame`. Do not open the PDF in `parse` itself.",
+        "- Define `to_frame(rows: list) -> pd.DataFrame` and do all conversion there, vectorized: build `pd.DataFrame(rows, columns=...)`, keep rows whose date cell matches the date format, append date-less lines to the previous row's description, convert amount cells with `pd.to_numeric(..., errors='coerce')`. Every amount is read from its own column; never infer debit or credit from the balance or from token positions.",
+        "- Also define `parse_iter(pdf_path: str)` that walks `iter_pages(pdf_path, parse_page)` (from utils.stream) and yields `to_frame(rows)` for each page's completed transactions. A description can wrap onto the next page, whose first date-less lines then belong to the previous page's last transaction: hold back the rows from the last dated row onward and prepend them to the next page's rows, and yield the held-back rows after the last page. Skip empty chunks. Concatenating its chunks must equal `parse(pdf_path)`.",
+    ]
+
+def build_prompt(state, budget: int | None = None) -> tuple[str, dict]:
+    """
+    Builds the code-generation prompt for the current agent state.
+
+    Args:
+        state (dict): Agent state (csv_columns, csv_shape, csv_sample,
+                      pdf_sample, feedback_msg and, if present, layout
+                      and reference)
+        budget (int | None): Token budget; defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        tuple: (prompt, stats) where stats has "tokens", "budget",
+               "feedback_tokens" (before compression) and "est_latency_s"
+    """
+    budget = TOKEN_BUDGET if budget is None else budget
     lines = [
-        "Write a Python function `parse(pdf_path: str) -> pd.DataFrame` that extracts transactions from a bank statement PDF.",
+        "Write a Python function `parse(pdf_path: str, workers: int = 1) -> pd.DataFrame` that extracts transactions from a bank statement PDF.",
         "Rules:",
-        "- Use ONLY: pandas, pdfplumber, re, numpy.",
+        "- Use ONLY: pandas, pdfplumber, re, numpy, `map_pages` (utils.parallel), `iter_pages` (utils.stream), `page_text`/`page_words` (utils.page_cache), `load_layout`/`table_rows` (utils.layout).",
+        *(_layout_rules(state) if state.get('layout') else _text_rules()),
         "- Output must EXACTLY match the provided CSV schema & values.",
         f"- Expected columns: {state['csv_columns']}",
         f"- Expected rows: {state['csv_shape'][0]}",
@@ -12,14 +184,57 @@ def create_prompt(state) -> str:
         "",
         "Note: Output only valid and complete Python code with proper indentation.",
         "Don't include markdown formatting like ```python.",
-        "**CSV sample:**"
     ]
-    for r in state['csv_sample']:
-        lines.append("  - " + ", ".join(f"{k}='{v}'" if isinstance(v, str) else f"{k}={v}" for k, v in r.items()))
-    if state['pdf_sample']:
-        lines.append(f"\n**PDF sample text:**\n{state['pdf_sample']}")
+    closing = "\nReturn ONLY the Python code for the function, no markdown, no explanations."
+    remaining = budget - count_tokens("\n".join(lines) + closing)
+
+    feedback, feedback_tokens = [], 0
     if state['feedback_msg']:
-        lines.append(f"\n**Previous test feedback:**\n{state['feedback_msg']}")
-        lines.append("Fix these issues without changing the output format.")
-    lines.append("\nReturn ONLY the Python code for the function, no markdown, no explanations.")
-    return "\n".join(lines)
+        feedback_tokens = count_tokens(state['feedback_msg'])
+        header = ["\n**Previous test feedback:**", "Fix these issues without changing the output format."]
+        room = max(remaining // 2, remaining - 400) - _cost(header)
+        text = summarize_feedback(state['feedback_msg'], room) if room > 0 else ""
+        if text:
+            feedback = [header[0], text, header[1]]
+            remaining -= _cost(feedback)
+
+    reference = []
+    if state.get('reference'):
+        ref = state['reference']
+        header = [f"\n**Closest existing parser ({ref['bank']}, layout similarity {ref['similarity']:.2f}); "
+                  "adapt it instead of starting from scratch:**"]
+        if code := fit_lines(ref['code'].splitlines(), remaining // 2 - _cost(header)):
+            reference = header + code
+            remaining -= _cost(reference)
+
+    samples = []
+    if state['pdf_sample']:
+        header = ["\n**PDF sample text:**"]
+        if pdf_lines := fit_lines(state['pdf_sample'].splitlines(), remaining // 2 - _cost(header)):
+            samples = header + pdf_lines
+            remaining -= _cost(samples)
+
+    csv = []
+    rows = ["  - " + ", ".join(f"{k}='{v}'" if isinstance(v, str) else f"{k}={v}" for k, v in r.items())
+            for r in state['csv_sample']]
+    if rows := fit_lines(rows, remaining - _cost(["**CSV sample:**"])):
+        csv = ["**CSV sample:**", *rows]
+
+    # Per-line counts can be off by a token where lines join; trim the lowest
+    # priority sections line by line in that case (a lone header goes too)
+    sections = [csv, samples, reference, feedback]
+    prompt = "\n".join(lines + csv + samples + reference + feedback) + closing
+    while (tokens := count_tokens(prompt)) > budget and any(sections):
+        section = next(s for s in sections if s)
+        section.pop()
+        if len(section) == 1:
+            section.clear()
+        prompt = "\n".join(lines + csv + samples + reference + feedback) + closing
+    return prompt, {"tokens": tokens, "budget": budget, "feedback_tokens": feedback_tokens,
+                    "est_latency_s": round(estimate_latency(tokens), 2)}
+
+def create_prompt(state) -> str:
+    """
+    Returns the code-generation prompt for `state` (see `build_prompt`).
+    """
+    return build_prompt(state)[0]
@@ -0,0 +1,121 @@
+"""
+Parser registry
+
+Loads each parser module once and keeps it, keyed by the xxh3 hash of its
+source:
+
+- `load_module` returns the cached module while the file's content is
+  unchanged and re-executes it only when the code changes. The source is
+  compiled from the exact bytes that were hashed, so a rewrite within the
+  same second can never pick up stale bytecode.
+- `get_parser(bank)` is the entry point for batch and service callers.
+- `write_parser` skips rewriting a parser whose code has not changed.
+- Test verdicts are remembered per (code, PDF, CSV, layout, backend), so an agent
+  iteration that produces byte-identical code gets its previous verdict back
+  immediately.
+"""
+
+import os, threading, importlib.util
+import xxhash
+from utils.page_cache import file_digest
+
+PARSER_DIR = "custom_parsers"
+
+_modules = {}   # absolute path -> (source digest, module)
+_verdicts = {}  # verdict key -> (ok, feedback)
+_lock = threading.Lock()
+
+
+def parser_path(bank: str) -> str:
+    return os.path.join(PARSER_DIR, f"{bank}_parser.py")
+
+def banks() -> list[str]:
+    """Returns the banks with a parser under PARSER_DIR, sorted ([] before the first one)."""
+    if not os.path.isdir(PARSER_DIR):
+        return []
+    return sorted(f.removesuffix("_parser.py") for f in os.listdir(PARSER_DIR) if f.endswith("_parser.py"))
+
+def layout_path(bank: str) -> str:
+    """Returns the path of a bank's table layout fingerprint (see utils.layout)."""
+    return os.path.join(PARSER_DIR, f"{bank}_layout.json")
+
+def source_digest(source: bytes) -> str:
+    return xxhash.xxh3_64(source).hexdigest()
+
+def load_module(name: str, path: str):
+    """
+    Returns the module for `path`, executing it only if its content changed.
+
+    Args:
+        name (str): Module name, e.g. "icici_parser"
+        path (str): Path of the module file
+
+    Returns:
+        module: Loaded module (the cached object when the code is unchanged)
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = source_digest(source)
+    key = os.path.abspath(path)
+    with _lock:
+        cached = _modules.get(key)
+        if cached and cached[0] == digest:
+            return cached[1]
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    exec(compile(source, path, "exec"), mod.__dict__)
+    with _lock:
+        _modules[key] = (digest, mod)
+    return mod
+
+def get_parser(bank: str):
+    """
+    Returns the loaded parser module for a bank.
+
+    Example:
+        >>> get_parser("icici").parse("data/icici/icici_sample.pdf")
+    """
+    return load_module(f"{bank}_parser", parser_path(bank))
+
+def write_parser(bank: str, code: str) -> bool:
+    """
+    Writes a bank's parser file unless it already holds exactly `code`.
+
+    Returns:
+        bool: True if the file was written
+    """
+    path = parser_path(bank)
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == code:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(code)
+    return True
+
+def verdict_key(state) -> tuple | None:
+    """
+    Identifies a test run by parser code, input files, the bank's layout
+    fingerprint and PDF backend.
+
+    Returns None when an input cannot be read (the test will report it).
+    """
+    try:
+        with open(state.get("parser_path") or parser_path(state["bank"]), "rb") as f:
+            code = source_digest(f.read())
+        layout = layout_path(state["bank"])
+        return (code, file_digest(state["pdf_path"]), file_digest(state["csv_path"]),
+                file_digest(layout) if os.path.exists(layout) else None, os.getenv("PDF_BACKEND", "pdfplumber"))
+    except OSError:
+        return None
+
+def get_verdict(key) -> tuple[bool, str] | None:
+    with _lock:
+        return _verdicts.get(key) if key else None
+
+def set_verdict(key, verdict: tuple[bool, str]) -> None:
+    if key:
+        with _lock:
+            _verdicts[key] = verdict
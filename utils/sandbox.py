@@ -0,0 +1,367 @@
+"""
+Sandboxed worker pool for running generated parser code
+
+Key features:
+- Pre-started worker processes with pandas, numpy, pdfplumber and the parser
+  helper modules already imported, so each test skips the import cost
+- Per-call wall-time limit enforced by the parent (the worker is killed and
+  replaced on timeout)
+- Per-call CPU-time and per-worker memory limits via `resource` (POSIX only)
+- Results come back as (True, value) or (False, structured error), so a
+  hostile or broken parser can never hang or crash the agent process
+- Results are sent back as JSON, with DataFrames as Arrow IPC streams, and
+  never unpickled in the agent: a returned object cannot run code there
+
+The sandbox limits resources only. Workers run as the same user as the
+agent, with the same file system and network access.
+
+Configuration (environment variables):
+- SANDBOX: "0" runs everything in-process instead (default "1")
+- SANDBOX_WORKERS: number of worker processes (default min(4, CPUs), at least 2)
+- SANDBOX_TIMEOUT: wall-time limit per call in seconds (default 120)
+- SANDBOX_CPU_SECONDS: CPU-time limit per call (default 120)
+- SANDBOX_MEMORY_MB: address-space limit per worker (default 4096)
+"""
+
+import os, json, queue, atexit, threading, traceback, contextvars
+import multiprocessing as mp
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENABLED = os.getenv("SANDBOX", "1") != "0"
+WORKERS = int(os.getenv("SANDBOX_WORKERS", max(2, min(4, os.cpu_count() or 1))))
+TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "120"))
+CPU_SECONDS = float(os.getenv("SANDBOX_CPU_SECONDS", "120"))
+MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "4096"))
+
+WARM_MODULES = ["numpy", "pandas", "pdfplumber", "utils.helpers", "utils.parallel", "utils.stream", "utils.layout"]
+
+_pool = None
+_pool_lock = threading.Lock()
+_scope = contextvars.ContextVar("sandbox_scope", default=None)
+
+
+def _error(kind: str, message: str, tb: str = "") -> dict:
+    return {"type": kind, "message": message, "traceback": tb}
+
+def _encode(value, frames: list):
+    """
+    Turns a call result into JSON-compatible data. DataFrames are appended to
+    `frames` as Arrow IPC bytes and replaced by their index; tuples are tagged
+    so they come back as tuples.
+    """
+    if isinstance(value, pd.DataFrame):
+        import pyarrow as pa
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(value)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        frames.append(sink.getvalue().to_pybytes())
+        return {"__frame__": len(frames) - 1}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v, frames) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v, frames) for v in value]
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise TypeError("dict keys must be strings")
+        return {k: _encode(v, frames) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"cannot return a {type(value).__name__} from the sandbox")
+
+def _decode(data, frames: list):
+    """Inverse of `_encode`, run in the agent."""
+    if isinstance(data, list):
+        return [_decode(v, frames) for v in data]
+    if isinstance(data, dict):
+        if "__frame__" in data:
+            import pyarrow as pa
+            return pa.ipc.open_stream(frames[data["__frame__"]]).read_all().to_pandas()
+        if "__tuple__" in data:
+            return tuple(_decode(v, frames) for v in data["__tuple__"])
+        return {k: _decode(v, frames) for k, v in data.items()}
+    return data
+
+def _send_result(conn, result: tuple) -> None:
+    frames = []
+    try:
+        header = json.dumps({"result": _encode(result, frames), "frames": len(frames)}).encode()
+    except (TypeError, ValueError) as e:
+        frames = []
+        err = (False, _error("SerializationError", f"could not send result back: {e}"))
+        header = json.dumps({"result": _encode(err, frames), "frames": 0}).encode()
+    conn.send_bytes(header)
+    for frame in frames:
+        conn.send_bytes(frame)
+
+def _recv_result(conn, timeout: float) -> tuple | None:
+    """Reads what `_send_result` sent; None if its frames do not arrive in time."""
+    header = json.loads(conn.recv_bytes())
+    frames = []
+    for _ in range(header["frames"]):
+        if not conn.poll(timeout):
+            return None
+        frames.append(conn.recv_bytes())
+    return _decode(header["result"], frames)
+
+def _worker_main(conn, memory_mb: int) -> None:
+    """
+    Worker loop: imports the warm modules once, then runs calls until the
+    parent closes the pipe.
+    """
+    import importlib
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        try:
+            fn, args, cwd, cpu_seconds = conn.recv()
+        except (EOFError, OSError):
+            break
+        if resource is not None and cpu_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+        try:
+            os.chdir(cwd)
+            result = (True, fn(*args))
+        except MemoryError:
+            result = (False, _error("MemoryError", f"memory limit of {memory_mb} MB exceeded"))
+        except BaseException as e:
+            result = (False, _error(type(e).__name__, str(e), traceback.format_exc()))
+        _send_result(conn, result)
+
+
+class CancelScope:
+    """
+    Calls made under a scope (see `cancel_scope`); `cancel` stops them all.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._procs = set()
+        self._lock = threading.Lock()
+
+    def _enter(self, proc) -> bool:
+        with self._lock:
+            if not self.cancelled:
+                self._procs.add(proc)
+            return not self.cancelled
+
+    def _exit(self, proc) -> bool:
+        """Forgets a worker; True if the scope was cancelled (it may be dead)."""
+        with self._lock:
+            self._procs.discard(proc)
+            return self.cancelled
+
+    def cancel(self) -> None:
+        """
+        Kills the workers running this scope's calls (the pool replaces
+        them) and makes later calls under the scope return "Cancelled".
+        """
+        with self._lock:
+            self.cancelled = True
+            for proc in self._procs:
+                if proc.is_alive():
+                    proc.kill()
+
+@contextmanager
+def cancel_scope():
+    """
+    Groups the sandbox calls made in this context, including threads started
+    with a copy of it, so they can be stopped together.
+
+    Example:
+        >>> with cancel_scope() as scope:
+        ...     futures = [pool.submit(run_test, s) for s in states]
+        ...     first = next(as_completed(futures))
+        ...     scope.cancel()   # the other calls stop now, not when they finish
+    """
+    scope = CancelScope()
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of long-lived, resource-limited worker processes.
+
+    Workers are forked from a forkserver that has the heavy modules preloaded
+    (spawned on platforms without forkserver). A worker that times out, hits
+    its CPU limit or dies is killed and replaced; the pool stays usable.
+
+    Example:
+        >>> pool = SandboxPool(workers=2, timeout=30)
+        >>> ok, value = pool.call(load_and_parse, "custom_parsers/icici_parser.py", pdf)
+        >>> ok, value = pool.call(spin_forever)
+        >>> ok, value["type"]
+        (False, 'Timeout')
+    """
+
+    def __init__(self, workers: int = WORKERS, timeout: float = TIMEOUT,
+                 cpu_seconds: float = CPU_SECONDS, memory_mb: int = MEMORY_MB):
+        if "forkserver" in mp.get_all_start_methods():
+            self._ctx = mp.get_context("forkserver")
+            self._ctx.set_forkserver_preload(WARM_MODULES)
+        else:
+            self._ctx = mp.get_context("spawn")
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._idle = queue.Queue()
+        self._procs = set()
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sandbox")
+
+    def _spawn(self):
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child, self.memory_mb), name="sandbox-worker")
+        proc.start()
+        child.close()
+        self._procs.add(proc)
+        return proc, parent
+
+    def _retire(self, worker) -> None:
+        proc, conn = worker
+        conn.close()
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+        self._procs.discard(proc)
+
+    def _replace(self, worker) -> None:
+        self._retire(worker)
+        self._idle.put(self._spawn())
+
+    def call(self, fn, *args, timeout: float | None = None) -> tuple[bool, object]:
+        """
+        Runs `fn(*args)` in a worker, in the caller's current directory.
+
+        Args:
+            fn (callable): Picklable module-level function
+            *args: Picklable arguments
+            timeout (float | None): Wall-time limit; defaults to the pool's
+
+        Returns:
+            tuple: (True, return value) or (False, error dict with "type",
+                   "message" and "traceback"). The return value must be built
+                   from DataFrames, dicts with string keys, lists, tuples and
+                   JSON scalars; anything else comes back as a
+                   "SerializationError".
+        """
+        timeout = self.timeout if timeout is None else timeout
+        scope = _scope.get()
+        worker = self._idle.get()
+        proc, conn = worker
+        if scope is not None and not scope._enter(proc):
+            self._idle.put(worker)
+            return False, _error("Cancelled", "call cancelled before it started")
+        try:
+            conn.send((fn, args, os.getcwd(), self.cpu_seconds))
+            if conn.poll(timeout) and (result := _recv_result(conn, timeout)) is not None:
+                if scope is not None and scope._exit(proc):
+                    self._replace(worker)  # finished, but possibly killed by the cancel
+                else:
+                    self._idle.put(worker)
+                return result
+            err = _error("Timeout", f"wall-time limit of {timeout:g}s exceeded")
+        except (EOFError, OSError, BrokenPipeError):
+            proc.join(1)
+            if scope is not None and scope.cancelled:
+                err = _error("Cancelled", "call cancelled while running")
+            elif proc.exitcode is not None and proc.exitcode < 0:
+                err = _error("Killed", f"worker killed by signal {-proc.exitcode} (CPU or memory limit)")
+            else:
+                err = _error("WorkerDied", f"worker exited with code {proc.exitcode}")
+        finally:
+            if scope is not None:
+                scope._exit(proc)
+        self._replace(worker)
+        return False, err
+
+    def submit(self, fn, *args, timeout: float | None = None):
+        """
+        Non-blocking `call`; returns a concurrent.futures.Future of its result.
+        The call runs in a copy of the caller's context (trace, cancel scope).
+        """
+        return self._executor.submit(contextvars.copy_context().run, self.call, fn, *args, timeout=timeout)
+
+    def close(self) -> None:
+        """
+        Stops every worker process.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for proc in list(self._procs):
+            if proc.is_alive():
+                proc.kill()
+            proc.join()
+        self._procs.clear()
+
+
+def get_pool() -> SandboxPool:
+    """
+    Returns the process-wide sandbox pool, starting it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            atexit.register(_pool.close)
+        return _pool
+
+def parse_file(parser_path: str, pdf_path: str, document: str | None = None):
+    """
+    Worker-side entry point: runs a parser file's `parse(pdf_path)`.
+
+    Parser modules stay loaded in the worker between calls (see
+    `utils.registry`) until the file's content changes. With `document`, only
+    pages not seen in that document's last parse are parsed (see
+    `utils.incremental`).
+    """
+    from utils.helpers import load_parser_module
+    bank = os.path.basename(parser_path).removesuffix(".py").removesuffix("_parser")
+    if document:
+        from utils.incremental import parse_incremental
+        return parse_incremental(bank, pdf_path, document, parser_path)[0]
+    return load_parser_module(bank, parser_path).parse(pdf_path)
+
+def run_parser(parser_path: str, pdf_path: str, timeout: float | None = None) -> tuple[bool, object]:
+    """
+    Runs a parser file's `parse(pdf_path)` in the sandbox.
+
+    Args:
+        parser_path (str): Path to the parser module
+        pdf_path (str): PDF to parse
+        timeout (float | None): Wall-time limit; defaults to SANDBOX_TIMEOUT
+
+    Returns:
+        tuple: (True, DataFrame) or (False, structured error dict)
+
+    Example:
+        >>> ok, df = run_parser("custom_parsers/icici_parser.py", "data/icici/icici_sample.pdf")
+    """
+    return get_pool().call(parse_file, parser_path, pdf_path, timeout=timeout)
+
+def format_error(err: dict) -> str:
+    """
+    Renders a structured sandbox error as test feedback text.
+    """
+    msg = f"ERROR DURING TEST: {err['type']}: {err['message']}"
+    return f"{msg}\n{err['traceback']}" if err.get("traceback") else msg
@@ -0,0 +1,93 @@
+from utils.backends import open_pdf
+
+def iter_pages(pdf_path: str, page_fn):
+    """
+    Lazily applies a per-page parse function to every page of a PDF.
+
+    Only one page is held at a time: each page's layout cache is flushed as
+    soon as its rows have been produced, so memory stays bounded by the
+    largest page rather than the whole document.
+
+    Args:
+        pdf_path (str): File system path to the PDF file
+        page_fn (callable): Function taking a page (see utils.backends) and
+                            returning what it found on it
+
+    Yields:
+        The result of `page_fn` for each page, in page order
+
+    Example:
+        >>> from custom_parsers.icici_parser import parse_page
+        >>> for rows in iter_pages("data/icici/icici_sample.pdf", parse_page):
+        ...     print(len(rows))
+    """
+    with open_pdf(pdf_path) as pdf:
+        for page in pdf.pages:
+            try:
+                yield page_fn(page)
+            finally:
+                page.close()
+
+def write_csv(chunks, csv_path: str) -> int:
+    """
+    Appends DataFrame chunks to a CSV file as they arrive.
+
+    The header is written with the first chunk only. An existing file at
+    `csv_path` is replaced.
+
+    Args:
+        chunks (iterable): DataFrames sharing the same columns, e.g. the
+                           output of a parser's `parse_iter`
+        csv_path (str): Destination CSV path
+
+    Returns:
+        int: Total number of rows written
+
+    Example:
+        >>> from custom_parsers.icici_parser import parse_iter
+        >>> write_csv(parse_iter("data/icici/icici_sample.pdf"), "out.csv")
+        100
+    """
+    n = 0
+    with open(csv_path, "w", newline="") as f:
+        for df in chunks:
+            df.to_csv(f, header=(n == 0), index=False)
+            n += len(df)
+    return n
+
+def write_parquet(chunks, parquet_path: str) -> int:
+    """
+    Appends DataFrame chunks to a Parquet file as row groups.
+
+    The schema is taken from the first chunk; later chunks are cast to it so a
+    page with only NaN amounts does not break the writer. Requires pyarrow.
+
+    Args:
+        chunks (iterable): DataFrames sharing the same columns
+        parquet_path (str): Destination Parquet path
+
+    Returns:
+        int: Total number of rows written
+
+    Example:
+        >>> from custom_parsers.icici_parser import parse_iter
+        >>> write_parquet(parse_iter("data/icici/icici_sample.pdf"), "out.parquet")
+        100
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    n, writer = 0, None
+    try:
+        for df in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = pq.ParquetWriter(parquet_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            n += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
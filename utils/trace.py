@@ -0,0 +1,206 @@
+"""
+Run tracing
+
+Every agent run records a trace: a list of timed spans (graph nodes, helpers,
+LLM calls, parser load/parse/compare) with attributes such as token counts,
+retries and cache hits. The current trace lives in a context variable, so
+concurrent banks in batch mode each get their own, and instrumentation is a
+no-op when no trace is active.
+
+- `run(name, **attrs)` starts a trace for the enclosed block
+- `span(name, **attrs)` / `@timed(name)` record a timed span; the dict
+  yielded by `span` can be filled with attributes known only afterwards
+- `collect(fn, *args)` runs `fn` under a fresh trace and returns its spans,
+  so work done in a sandbox worker process can be `merge`d back
+- `Trace.export()` writes the trace as JSON to TRACE_DIR (default
+  .cache/traces; empty disables) and `write_prometheus` writes a Prometheus
+  textfile (node_exporter textfile collector format)
+
+Example:
+    >>> with trace.run("agent", bank="icici") as t:
+    ...     agent.invoke(state)
+    >>> t.summary()["node.plan"]
+    {'count': 2, 'seconds': 14.2, 'max_seconds': 8.1}
+"""
+
+import os, json, time, threading, functools, contextvars
+from contextlib import contextmanager
+
+TRACE_DIR = os.getenv("TRACE_DIR", ".cache/traces")
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", "")
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans recorded during one run, safe to append to from several threads."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.started = time.time()
+        self.seconds = None
+        self.spans = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, **attrs) -> None:
+        """Records a span that started at perf_counter() time `start`."""
+        span = {"name": name, "start": round(start - self._t0, 6), "seconds": round(seconds, 6),
+                "thread": threading.current_thread().name}
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def merge(self, spans: list[dict], start: float) -> None:
+        """Adds spans collected elsewhere (see `collect`), shifted to `start`."""
+        offset = start - self._t0
+        with self._lock:
+            self.spans.extend({**s, "start": round(s["start"] + offset, 6)} for s in spans)
+
+    def summary(self) -> dict:
+        """Returns {span name: {"count", "seconds", "max_seconds"}}."""
+        out = {}
+        for s in self.spans:
+            agg = out.setdefault(s["name"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            agg["count"] += 1
+            agg["seconds"] += s["seconds"]
+            agg["max_seconds"] = max(agg["max_seconds"], s["seconds"])
+        for agg in out.values():
+            agg["seconds"] = round(agg["seconds"], 6)
+        return out
+
+    def llm_totals(self) -> dict:
+        """Sums token counts, retries and cache hits over all LLM spans."""
+        totals = {"calls": 0, "cached": 0, "retries": 0, "prompt_tokens": 0, "response_tokens": 0}
+        for s in self.spans:
+            if s["name"].startswith("llm."):
+                a = s.get("attrs", {})
+                totals["calls"] += 1
+                totals["cached"] += bool(a.get("cached"))
+                for k in ("retries", "prompt_tokens", "response_tokens"):
+                    totals[k] += a.get(k, 0)
+        return totals
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "attrs": self.attrs, "started": self.started, "seconds": self.seconds,
+                "summary": self.summary(), "llm": self.llm_totals(), "spans": self.spans}
+
+    def export(self, out_dir: str | None = None) -> str | None:
+        """
+        Writes the trace as JSON and returns its path (None if disabled).
+        """
+        out_dir = TRACE_DIR if out_dir is None else out_dir
+        if not out_dir:
+            return None
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(self.started))
+        label = self.attrs.get("bank", self.name)
+        path = os.path.join(out_dir, f"{label}_{stamp}_{os.getpid()}_{id(self) % 10000:04d}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+
+def current() -> Trace | None:
+    return _current.get()
+
+@contextmanager
+def run(name: str, **attrs):
+    """Makes a new Trace current for the enclosed block and yields it."""
+    t = Trace(name, **attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        t.seconds = round(time.perf_counter() - t._t0, 6)
+        _current.reset(token)
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the enclosed block as a span of the current trace.
+
+    Yields the span's attribute dict; an exception is recorded as "error".
+    """
+    t = _current.get()
+    if t is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        t.add(name, start, time.perf_counter() - start, **attrs)
+
+def timed(name: str):
+    """Decorator recording every call of a function as a span."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def collect(fn, *args):
+    """
+    Runs `fn(*args)` under a fresh trace and returns (result, spans).
+
+    Used as the entry point in sandbox workers, whose spans would otherwise
+    be lost with the worker's trace.
+    """
+    with run("worker") as t:
+        result = fn(*args)
+    return result, t.spans
+
+def merge(spans: list[dict], start: float) -> None:
+    t = _current.get()
+    if t is not None:
+        t.merge(spans, start)
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+def write_prometheus(traces: list[Trace], path: str) -> None:
+    """
+    Writes run, span and LLM metrics for `traces` as a Prometheus textfile.
+
+    The file is replaced atomically so a collector never reads it half written.
+    """
+    lines = [
+        "# HELP agent_run_seconds Wall time of the last agent run per bank.",
+        "# TYPE agent_run_seconds gauge",
+        *(f"agent_run_seconds{_labels(bank=t.attrs.get('bank', t.name))} {t.seconds or 0}" for t in traces),
+        "# HELP agent_run_success Whether the last agent run per bank produced a passing parser.",
+        "# TYPE agent_run_success gauge",
+        *(f"agent_run_success{_labels(bank=t.attrs.get('bank', t.name))} {int(bool(t.attrs.get('success')))}"
+          for t in traces),
+        "# HELP agent_run_iterations Iterations used by the last agent run per bank.",
+        "# TYPE agent_run_iterations gauge",
+        *(f"agent_run_iterations{_labels(bank=t.attrs.get('bank', t.name))} {t.attrs.get('iterations', 0)}"
+          for t in traces),
+        "# HELP agent_span_seconds Time spent per span name.",
+        "# TYPE agent_span_seconds summary",
+    ]
+    for t in traces:
+        bank = t.attrs.get("bank", t.name)
+        for name, agg in sorted(t.summary().items()):
+            lines.append(f"agent_span_seconds_sum{_labels(bank=bank, span=name)} {agg['seconds']}")
+            lines.append(f"agent_span_seconds_count{_labels(bank=bank, span=name)} {agg['count']}")
+    lines += ["# HELP agent_llm_total LLM calls, cache hits, retries and tokens per bank.",
+              "# TYPE agent_llm_total counter"]
+    for t in traces:
+        for kind, value in t.llm_totals().items():
+            lines.append(f"agent_llm_total{_labels(bank=t.attrs.get('bank', t.name), kind=kind)} {value}")
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)